@@ -0,0 +1,737 @@
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Any, AsyncIterator, Collection, Iterator
+import os
+import contextlib
+import fcntl
+import mmap
+import shutil
+import struct
+import asyncio
+import time
+import pickle
+import weakref
+import snappy
+
+import msgspec
+
+import aiocache
+import lmdb
+import redis.asyncio
+from aiocache.serializers import BaseSerializer, PickleSerializer
+from boltdb import BoltDB
+
+from latency import timed
+from vendor import Vendor
+from zdict import ZDictCodec, train
+
+
+class CompressionSerializer(BaseSerializer):  # type: ignore
+    DEFAULT_ENCODING = None
+
+    # anything with compress/decompress, e.g. a ZDictCodec
+    def __init__(self, codec: Any = snappy) -> None:
+        super().__init__()
+        self.codec = codec
+
+    @timed("serialize")
+    def dumps(self, value: Any) -> Any:
+        return self.codec.compress(pickle.dumps(value))
+
+    @timed("deserialize")
+    def loads(self, value: Any) -> Any:
+        if value is None:
+            return None
+        return pickle.loads(self.codec.decompress(value))
+
+
+class TimedPickleSerializer(PickleSerializer):  # type: ignore
+    # aiocache's, in the same spans as the serializers above
+    @timed("serialize")
+    def dumps(self, value: Any) -> Any:
+        return super().dumps(value)
+
+    @timed("deserialize")
+    def loads(self, value: Any) -> Any:
+        return super().loads(value)
+
+
+class MsgpackSerializer(BaseSerializer):  # type: ignore
+    DEFAULT_ENCODING = None
+
+    RAW = b"\x00"
+    SNAPPY = b"\x01"
+
+    # values above half an LMDB page spill into overflow pages, only those
+    # are worth the snappy round trip
+    def __init__(self, schema: Any = Vendor, compress_min_size=2048) -> None:
+        super().__init__()
+        self.encoder = msgspec.msgpack.Encoder()
+        self.decoder = msgspec.msgpack.Decoder(schema)
+        self.compress_min_size = compress_min_size
+
+    @timed("serialize")
+    def dumps(self, value: Any) -> Any:
+        data = self.encoder.encode(value)
+        if len(data) < self.compress_min_size:
+            return self.RAW + data
+        return self.SNAPPY + snappy.compress(data)
+
+    @timed("deserialize")
+    def loads(self, value: Any) -> Any:
+        # accepts memoryviews, so LMDB page buffers are decoded in place
+        if value is None:
+            return None
+        body = memoryview(value)[1:]
+        if value[0] == self.SNAPPY[0]:
+            body = snappy.uncompress(body)
+        return self.decoder.decode(body)
+
+
+def project(value: Any, fields: Collection[str]) -> dict[str, Any]:
+    # structs go by their encoded names, the same keys as the origin dicts
+    if not isinstance(value, dict):
+        value = msgspec.to_builtins(value)
+    return {f: value[f] for f in fields if f in value}
+
+
+# expiry in ms since the epoch, stored in front of every LMDB/BoltDB value and
+# in front of every expiry index key so the index sorts by time. 0 never expires
+EXPIRY = struct.Struct(">Q")
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def expires_at(ttl: int | None) -> int:
+    return now_ms() + int(ttl * 1000) if ttl else 0
+
+
+def expired(value: Any, now: int) -> bool:
+    # takes a packed header or an already unpacked expiry
+    expires = value if isinstance(value, int) else EXPIRY.unpack_from(value)[0]
+    return expires != 0 and expires <= now
+
+
+class CacheBackend(ABC):
+    # True when entries live inside the process, so pool workers can't share them
+    process_local = False
+
+    # True when a pool worker should keep its instance across requests
+    long_lived = False
+
+    # keys per chunk of a streamed or split read
+    chunk_size = 1000
+
+    @classmethod
+    def prepare(cls) -> None:
+        # wipe state left over from a previous run before the warm-up load
+        return
+
+    @classmethod
+    def cleanup(cls) -> None:
+        # release what outlives the instances once every worker has exited
+        return
+
+    @classmethod
+    def lmdb_readers(cls, workers: int) -> int:
+        # slots `workers` pool workers take in the reader table of an LMDB
+        # environment, wrappers ask their store
+        return 0
+
+    @abstractmethod
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        # returns hits only, misses are left out
+        ...
+
+    @abstractmethod
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        ...
+
+    async def mget_fields(
+        self, keys: list[str], fields: Collection[str]
+    ) -> list[tuple[str, dict[str, Any]]]:
+        # hits with only the requested fields. this decodes whole values, stores
+        # that keep fields apart override it to skip the others
+        return [(k, project(v, fields)) for k, v in await self.mget(keys)]
+
+    async def mget_stream(
+        self, keys: list[str]
+    ) -> AsyncIterator[tuple[list[tuple[str, Any]], list[str]]]:
+        # hits and misses chunk by chunk, every key shows up once in either.
+        # the caller can fetch the misses of a chunk while later ones decode
+        for i in range(0, len(keys), self.chunk_size):
+            chunk = keys[i : i + self.chunk_size]
+            hits = await self.mget(chunk)
+            found = set(k for k, _ in hits)
+            yield hits, [k for k in chunk if k not in found]
+            # whatever the caller started on this chunk gets to run
+            await asyncio.sleep(0)
+
+    def bulk_target(self) -> "LMDBCache | None":
+        # the LMDB store a warm-up can bulk load instead of calling mset, for
+        # backends that write the values they are given unchanged
+        return None
+
+    def bulk_loaded(self, keys: list[str]) -> None:
+        # called with every key after a bulk load went around mset
+        return
+
+    def stats(self) -> dict[str, float]:
+        # running counters, the benchmark reports the delta of each request
+        return {}
+
+    def close(self) -> None:
+        return
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class MemoryCache(CacheBackend):
+    process_local = True
+
+    def __init__(self, read_only=False) -> None:
+        self.db = aiocache.SimpleMemoryCache(serializer=TimedPickleSerializer())
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        values = await self.db.multi_get(keys)
+        return [(k, v) for k, v in zip(keys, values) if v is not None]
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        await self.db.multi_set(pairs, ttl=ttl)
+
+
+class LRUMemoryCache(CacheBackend):
+    # bounded by entry count, values are kept as the objects passed to mset
+    process_local = True
+
+    def __init__(self, read_only=False, capacity=100000) -> None:
+        self.capacity = capacity
+        self.entries: OrderedDict[str, tuple[int, Any]] = OrderedDict()
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        ret = []
+        now = now_ms()
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            if expired(entry[0], now):
+                del self.entries[key]
+                continue
+            self.entries.move_to_end(key)
+            ret.append((key, entry[1]))
+        return ret
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        expires = expires_at(ttl)
+        for key, value in pairs:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def delete(self, keys: list[str]) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+
+class ExpiringCache(CacheBackend):
+    # entries removed per write transaction, keeps the single writer lock short
+    sweep_batch = 1000
+
+    sweeper: asyncio.Task | None = None
+
+    # False when deleting entries is not safe in the store
+    sweeps = True
+
+    # the file stores are blocking, get/put run a whole transaction
+    @abstractmethod
+    def get(self, keys: list[str]) -> list[tuple[str, Any]]:
+        ...
+
+    @abstractmethod
+    def put(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        ...
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        return self.get(keys)
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        await self.run_write(self.put, pairs, ttl)
+
+    async def run_write(self, fn, *args) -> Any:
+        # inline here, the threaded variants hand it to their writer thread
+        return fn(*args)
+
+    @abstractmethod
+    def sweep_expired(self, now: int, limit: int) -> int:
+        # drops up to `limit` expired index entries, returns how many it looked at
+        ...
+
+    async def sweep(self) -> int:
+        if self.read_only:
+            return 0
+
+        now = now_ms()
+        total = 0
+        while True:
+            n = await self.run_write(self.sweep_expired, now, self.sweep_batch)
+            total += n
+            if n < self.sweep_batch:
+                return total
+            # let readers and writers in between batches
+            await asyncio.sleep(0)
+
+    def start_sweeper(self, interval=1.0) -> asyncio.Task:
+        async def loop():
+            while True:
+                await self.sweep()
+                await asyncio.sleep(interval)
+
+        self.sweeper = asyncio.create_task(loop())
+        return self.sweeper
+
+    def close(self) -> None:
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            self.sweeper = None
+
+
+class LMDBCache(ExpiringCache):
+    path = "./lmdb"
+
+    # hand out memoryviews into the mmap instead of copying each value
+    buffers = False
+
+    # concurrent read transactions of one instance, ThreadedCache reads on more
+    readers = 1
+
+    # slots of the reader table, shared by all processes and fixed when the
+    # environment is created. a pool worker holds up to `readers`, plus one for
+    # the sweeper or writer thread. LMDB's default
+    max_readers = 126
+
+    def __init__(self, read_only=False, path: str | None = None) -> None:
+        self.read_only = read_only
+        self.path = path or self.path
+        self.serializer = self.make_serializer()
+        self.db = lmdb.open(
+            self.path,
+            max_readers=self.max_readers,
+            map_size=1 * 1024 * 1024 * 1024,
+            readonly=read_only,
+            lock=True,
+            readahead=False,
+            meminit=False,
+            writemap=True,
+            map_async=True,
+            sync=True,
+            max_dbs=2,
+        )
+        self.data = self.db.open_db(b"data", create=not read_only)
+        self.expiry = self.db.open_db(b"expiry", create=not read_only)
+
+    @classmethod
+    def make_serializer(cls) -> BaseSerializer:
+        return CompressionSerializer()
+
+    @classmethod
+    def lmdb_readers(cls, workers: int) -> int:
+        return workers * (cls.readers + 1)
+
+    def bulk_target(self) -> "LMDBCache | None":
+        return self
+
+    @classmethod
+    def prepare(cls) -> None:
+        shutil.rmtree(cls.path, ignore_errors=True)
+
+    def get(self, keys: list[str]) -> list[tuple[str, Any]]:
+        # buffers are only valid inside the transaction, decode before leaving it
+        # expired entries are skipped here and left for the sweeper
+        now = now_ms()
+        with self.db.begin(write=False, buffers=self.buffers) as txn:
+            cursor = txn.cursor(db=self.data)
+            keys = [k.encode() for k in keys]
+            return [
+                (str(k, "utf-8"), self.serializer.loads(v[EXPIRY.size :]))
+                for k, v in cursor.getmulti(keys)
+                if not expired(v, now)
+            ]
+
+    def put(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        if self.read_only:
+            return
+
+        # encoded before the transaction, the writer lock of the environment
+        # is shared by all processes and only covers the puts
+        header = EXPIRY.pack(expires_at(ttl))
+        records = [(k.encode(), header + self.serializer.dumps(v)) for k, v in pairs]
+        with self.db.begin(write=True) as txn:
+            for key, value in records:
+                txn.put(key, value, db=self.data)
+                if ttl:
+                    txn.put(header + key, b"", db=self.expiry)
+
+    def sweep_expired(self, now: int, limit: int) -> int:
+        with self.db.begin(write=True) as txn:
+            entries = []
+            for entry in txn.cursor(db=self.expiry).iternext(values=False):
+                if len(entries) >= limit or not expired(entry, now):
+                    break
+                entries.append(entry)
+
+            for entry in entries:
+                txn.delete(entry, db=self.expiry)
+                # the key may have been rewritten with a later expiry since
+                key = entry[EXPIRY.size :]
+                value = txn.get(key, db=self.data)
+                if value is not None and value[: EXPIRY.size] == entry[: EXPIRY.size]:
+                    txn.delete(key, db=self.data)
+
+        return len(entries)
+
+    def close(self) -> None:
+        super().close()
+        self.db.close()
+
+
+class LMDBMsgpackCache(LMDBCache):
+    buffers = True
+
+    @classmethod
+    def make_serializer(cls) -> BaseSerializer:
+        return MsgpackSerializer(Vendor)
+
+
+class BoltDBCache(ExpiringCache):
+    path = "./boltdb"
+
+    # boltdb 0.0.2 corrupts unrelated values when it deletes a few hundred keys
+    # in a file with more than one bucket (reproduced without this module), so
+    # expired entries are only skipped on read, prepare() drops the file
+    sweeps = False
+
+    def __init__(self, read_only=False) -> None:
+        self.read_only = read_only
+        self.serializer = CompressionSerializer()
+        self.db = BoltDB(self.path, readonly=read_only)
+        if not read_only:
+            with self.locked(fcntl.LOCK_EX), self.db.update() as tx:
+                for name in (b"data", b"expiry"):
+                    if tx.bucket(name) is None:
+                        tx.create_bucket(name)
+
+    @classmethod
+    def prepare(cls) -> None:
+        for path in (cls.path, f"{cls.path}.lock"):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    @contextlib.contextmanager
+    def locked(self, kind: int) -> Iterator[None]:
+        # boltdb only knows the readers of its own process, and its lockf is
+        # dropped by close() and shared by all handles of a process. a flock on
+        # a separate file, opened per transaction so threads and coroutines of
+        # one process exclude each other too, keeps reads out of a commit
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, kind)
+            yield
+        finally:
+            os.close(fd)
+
+    def remap(self) -> None:
+        # a writer in another process may have grown the file since it was
+        # mapped, the old map stays valid until its pages are dropped
+        size = os.fstat(self.db.fd).st_size
+        if size > self.db.datasz:
+            self.db.datasz = size
+            self.db.mmap = memoryview(
+                mmap.mmap(self.db.fd, size, access=mmap.ACCESS_WRITE)
+            )
+
+    def get(self, keys: list[str]) -> list[tuple[str, Any]]:
+        ret = []
+        now = now_ms()
+        with self.locked(fcntl.LOCK_SH):
+            self.remap()
+            with self.db.view() as tx:
+                b = tx.bucket(b"data")
+                for key in keys:
+                    value = b.get(key.encode())
+                    if value is None or expired(value, now):
+                        continue
+                    # boltdb 0.0.2 can commit a value over a page it still
+                    # points to, a miss makes the writer store it again
+                    try:
+                        ret.append((key, self.serializer.loads(value[EXPIRY.size :])))
+                    except (snappy.UncompressError, pickle.UnpicklingError, EOFError):
+                        pass
+        return ret
+
+    def put(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        if self.read_only:
+            return
+
+        header = EXPIRY.pack(expires_at(ttl))
+        with self.locked(fcntl.LOCK_EX), self.db.update() as tx:
+            b = tx.bucket(b"data")
+            index = tx.bucket(b"expiry")
+            for key, value in pairs:
+                key = key.encode()
+                b.put(key, header + self.serializer.dumps(value))
+                if ttl:
+                    index.put(header + key, b"")
+
+    def sweep_expired(self, now: int, limit: int) -> int:
+        with self.locked(fcntl.LOCK_EX), self.db.update() as tx:
+            b = tx.bucket(b"data")
+            index = tx.bucket(b"expiry")
+
+            entries = []
+            for entry, _ in index:
+                if len(entries) >= limit or not expired(entry, now):
+                    break
+                entries.append(bytes(entry))
+
+            for entry in entries:
+                index.delete(entry)
+                # the key may have been rewritten with a later expiry since
+                key = entry[EXPIRY.size :]
+                value = b.get(key)
+                if value is not None and value[: EXPIRY.size] == entry[: EXPIRY.size]:
+                    b.delete(key)
+
+        return len(entries)
+
+    def close(self) -> None:
+        super().close()
+        # BoltDB.__del__ closes the file itself and raises when closed twice,
+        # so only drop the file lock here to let the pool workers open it
+        fcntl.lockf(self.db.fd, fcntl.LOCK_UN)
+
+
+# connections per process, the concurrent requests of a pool worker and their
+# chunks wait for a free one instead of opening more
+REDIS_POOL_SIZE = 32
+
+# asyncio connections are bound to the loop that opened them
+redis_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.asyncio.Redis]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def shared_redis() -> redis.asyncio.Redis:
+    loop = asyncio.get_running_loop()
+    client = redis_clients.get(loop)
+    if client is None:
+        pool = redis.asyncio.BlockingConnectionPool(
+            host="localhost", port=6379, max_connections=REDIS_POOL_SIZE, timeout=None
+        )
+        client = redis_clients[loop] = redis.asyncio.Redis(connection_pool=pool)
+    return client
+
+
+class RedisCacheTest(CacheBackend):
+    # key prefix, backends storing another value format must not share keys
+    namespace = ""
+
+    # keys per command. one 8000 key MGET keeps redis busy for every other
+    # client until it is done, chunks interleave with their commands
+    chunk_size = 1000
+
+    def __init__(self, read_only=False) -> None:
+        self.serializer = self.make_serializer()
+
+    def make_serializer(self) -> BaseSerializer:
+        return CompressionSerializer()
+
+    def key(self, key: str) -> str:
+        # the layout aiocache used, entries written by older runs stay readable
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    async def fetch(self, start: int, names: list[str]) -> tuple[int, list[Any]]:
+        return start, await shared_redis().mget(names)
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        return [hit async for hits, _ in self.mget_stream(keys) for hit in hits]
+
+    async def mget_stream(
+        self, keys: list[str]
+    ) -> AsyncIterator[tuple[list[tuple[str, Any]], list[str]]]:
+        names = [self.key(k) for k in keys]
+        chunks = [
+            self.fetch(i, names[i : i + self.chunk_size])
+            for i in range(0, len(names), self.chunk_size)
+        ]
+
+        # every chunk is sent at once on its own connection, decoding the one
+        # that arrived first overlaps the round trips of the others
+        for chunk in asyncio.as_completed(chunks):
+            start, values = await chunk
+            hits, misses = [], []
+            for k, v in zip(keys[start:], values):
+                if v is None:
+                    misses.append(k)
+                else:
+                    hits.append((k, self.serializer.loads(v)))
+            yield hits, misses
+
+    async def store(self, records: list[tuple[str, bytes]], ttl: int | None) -> None:
+        async with shared_redis().pipeline(transaction=False) as pipe:
+            for name, value in records:
+                pipe.set(name, value, ex=ttl or None)
+            await pipe.execute()
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        writes = []
+        for i in range(0, len(pairs), self.chunk_size):
+            records = [
+                (self.key(k), self.serializer.dumps(v))
+                for k, v in pairs[i : i + self.chunk_size]
+            ]
+            writes.append(asyncio.create_task(self.store(records, ttl)))
+            # let the chunk go out before encoding the next one
+            await asyncio.sleep(0)
+        await asyncio.gather(*writes)
+
+
+class RedisUnchunkedCache(RedisCacheTest):
+    # a batch in a single command, like aiocache sends it, for comparison
+    chunk_size = 1 << 30
+
+
+class RedisZDictCache(RedisCacheTest):
+    # the first write trains the dictionary from the vendors it is writing
+    train_samples = 1000
+
+    namespace = "zdict"
+
+    def make_serializer(self) -> BaseSerializer:
+        # no client of its own, the dictionaries are read and published
+        # through the async one instead of blocking the loop
+        self.codec = ZDictCodec()
+        return CompressionSerializer(self.codec)
+
+    async def refresh(self) -> None:
+        self.codec.update(await shared_redis().hgetall(ZDictCodec.key))
+
+    async def publish(self, dictionary: bytes) -> int:
+        # HSETNX, so a process training at the same time gets the next version
+        while True:
+            version = self.codec.version + 1
+            if await shared_redis().hsetnx(ZDictCodec.key, version, dictionary):
+                self.codec.dictionaries[version] = dictionary
+                return version
+            await self.refresh()
+
+    async def fetch(self, start: int, names: list[str]) -> tuple[int, list[Any]]:
+        start, values = await super().fetch(start, names)
+        # trained by another process since
+        if not all(self.codec.known(v) for v in values if v is not None):
+            await self.refresh()
+        return start, values
+
+    @classmethod
+    def prepare(cls) -> None:
+        # versions start over at 1 with the dictionaries gone, a value left
+        # from a previous run would be decoded with the wrong one
+        db = redis.Redis(host="localhost", port=6379)
+        db.delete(ZDictCodec.key)
+        batch = []
+        for key in db.scan_iter(f"{cls.namespace}:*", count=10000):
+            batch.append(key)
+            if len(batch) == 10000:
+                db.unlink(*batch)
+                batch = []
+        if batch:
+            db.unlink(*batch)
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        if self.codec.version == 0 and pairs:
+            await self.refresh()
+        if self.codec.version == 0 and pairs:
+            samples = [pickle.dumps(v) for _, v in pairs[: self.train_samples]]
+            await self.publish(train(samples))
+        await super().mset(pairs, ttl=ttl)
+
+
+class TieredCache(CacheBackend):
+    # in-process L1 in front of the shared redis L2. writes are published so
+    # the other processes drop their stale L1 copies
+    channel = "cache-invalidate"
+
+    long_lived = True
+
+    def __init__(self, read_only=False, l1_capacity=100000, l1_ttl=5) -> None:
+        self.l1 = LRUMemoryCache(capacity=l1_capacity)
+        self.l2 = RedisCacheTest()
+        self.l1_ttl = l1_ttl
+
+        self.id = f"{os.getpid()}-{id(self)}"
+        self.redis = redis.asyncio.Redis(host="localhost", port=6379)
+        self.subscriber: asyncio.Task | None = None
+        self.counters = Counter()
+
+    async def invalidations(self) -> None:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            sender, keys = msgspec.msgpack.decode(message["data"])
+            if sender != self.id:
+                self.l1.delete(keys)
+                self.counters["invalidated"] += len(keys)
+
+    def subscribe(self) -> None:
+        # needs a running loop, so it starts with the first request
+        if self.subscriber is None:
+            self.subscriber = asyncio.create_task(self.invalidations())
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        self.subscribe()
+
+        start_time = time.perf_counter()
+        ret = await self.l1.mget(keys)
+        l1_time = time.perf_counter() - start_time
+
+        hit = set(k for k, _ in ret)
+        remain = [k for k in keys if k not in hit]
+
+        start_time = time.perf_counter()
+        values = await self.l2.mget(remain) if remain else []
+        l2_time = time.perf_counter() - start_time
+
+        await self.l1.mset(values, ttl=self.l1_ttl)
+
+        self.counters["l1_hit"] += len(hit)
+        self.counters["l2_hit"] += len(values)
+        self.counters["miss"] += len(remain) - len(values)
+        self.counters["l1_time"] += l1_time
+        self.counters["l2_time"] += l2_time
+
+        return ret + values
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        if not pairs:
+            return
+
+        self.subscribe()
+        await self.l2.mset(pairs, ttl=ttl)
+        await self.l1.mset(pairs, ttl=min(ttl or self.l1_ttl, self.l1_ttl))
+
+        message = msgspec.msgpack.encode((self.id, [k for k, _ in pairs]))
+        await self.redis.publish(self.channel, message)
+
+    def stats(self) -> dict[str, float]:
+        return dict(self.counters)
+
+    def close(self) -> None:
+        if self.subscriber is not None:
+            self.subscriber.cancel()
+            self.subscriber = None
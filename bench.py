@@ -0,0 +1,492 @@
+import argparse
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from random import sample
+from time import perf_counter
+from typing import Any, Collection
+
+from aiomultiprocess import Pool
+
+from backends import (
+    BoltDBCache,
+    CacheBackend,
+    ExpiringCache,
+    LMDBCache,
+    LMDBMsgpackCache,
+    LRUMemoryCache,
+    MemoryCache,
+    RedisCacheTest,
+    RedisUnchunkedCache,
+    RedisZDictCache,
+    TieredCache,
+    project,
+)
+from bloom import BloomBoltDBCache, BloomLMDBCache, BloomRedisCache
+from bulkload import bulk_load
+from latency import PHASES, Histogram, spans
+from latency import report as latency_report
+from origin import fetch
+from patch import PatchLMDBCache, PatchRedisCache
+from projection import SplitLMDBCache, SplitRedisCache
+from revalidate import (
+    RevalidatingCache,
+    RevalidatingLMDBCache,
+    RevalidatingMemoryCache,
+    RevalidatingRedisCache,
+)
+from sharded import ShardedLMDBCache, ShardedLMDBMsgpackCache
+from shmcache import SharedMemoryCache
+from singleflight import Origin, SingleFlight
+from threaded import ThreadedBoltDBCache, ThreadedLMDBMsgpackCache
+from tinylfu import TinyLFUCache
+from vendor import HOT_FIELDS
+from workload import Request, generate, record, replay
+
+# 300,000 restaurants
+ITEM_COUNT = 300000
+
+# expected hit ratio = 33%
+KEY_SPACE = ITEM_COUNT * 3
+
+REQUEST_SIZE = 8000
+REQUESTS = 5
+WORKERS = 4
+TTL = 60
+
+BACKENDS: dict[str, type[CacheBackend]] = {
+    "memory": MemoryCache,
+    "memory-swr": RevalidatingMemoryCache,
+    "lru": LRUMemoryCache,
+    "tinylfu": TinyLFUCache,
+    "lmdb": LMDBCache,
+    "lmdb-msgpack": LMDBMsgpackCache,
+    "lmdb-split": SplitLMDBCache,
+    "lmdb-patch": PatchLMDBCache,
+    "lmdb-swr": RevalidatingLMDBCache,
+    "lmdb-bloom": BloomLMDBCache,
+    "lmdb-sharded": ShardedLMDBCache,
+    "lmdb-msgpack-threaded": ThreadedLMDBMsgpackCache,
+    "lmdb-msgpack-sharded": ShardedLMDBMsgpackCache,
+    "boltdb": BoltDBCache,
+    "boltdb-threaded": ThreadedBoltDBCache,
+    "boltdb-bloom": BloomBoltDBCache,
+    "redis": RedisCacheTest,
+    "redis-unchunked": RedisUnchunkedCache,
+    "redis-zdict": RedisZDictCache,
+    "redis-split": SplitRedisCache,
+    "redis-patch": PatchRedisCache,
+    "redis-swr": RevalidatingRedisCache,
+    "redis-bloom": BloomRedisCache,
+    "tiered": TieredCache,
+    "shm": SharedMemoryCache,
+}
+
+
+@dataclass
+class Result:
+    total: int
+    hit: int
+    miss: int
+    read_time: float
+    total_time: float
+    lag: float = 0.0
+    stats: dict[str, float] = field(default_factory=dict)
+    phases: dict[str, Histogram] = field(default_factory=dict)
+
+
+class LoopLag:
+    # how late a sleeper wakes up, i.e. how long any other task of the process
+    # waits while a cache read blocks the event loop
+    def __init__(self, interval=0.001) -> None:
+        self.interval = interval
+        self.worst = 0.0
+        self.since = perf_counter()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.tick()
+            self.since = perf_counter()
+
+    def tick(self) -> None:
+        self.worst = max(self.worst, perf_counter() - self.since - self.interval)
+
+
+async def load(
+    origin: Origin, flight: SingleFlight | None, ids: list[str]
+) -> list[tuple[str, Any]]:
+    # the vendors to write back
+    if flight is None:
+        return await origin(ids)
+    # ids another request is already fetching are not written back twice
+    _, fresh = await flight.fetch(ids)
+    return fresh
+
+
+async def request(
+    cache: CacheBackend,
+    keys: list[str],
+    origin: Origin,
+    flight: SingleFlight | None = None,
+    fields: Collection[str] | None = None,
+    stream=False,
+) -> Result:
+    before = cache.stats()
+    # serializers add their time here, also from executor threads
+    spent = Counter()
+    token = spans.set(spent)
+    probe = LoopLag()
+    probing = asyncio.create_task(probe.run())
+    start_time = perf_counter()
+
+    loads = []
+    origin_start = None
+    if stream:
+        values = []
+        async for hits, misses in cache.mget_stream(keys):
+            if fields is not None:
+                hits = [(k, project(v, fields)) for k, v in hits]
+            values.extend(hits)
+            # the origin works on the known misses while later chunks decode
+            if misses:
+                origin_start = origin_start or perf_counter()
+                loads.append(asyncio.create_task(load(origin, flight, misses)))
+    elif fields is None:
+        values = await cache.mget(keys)
+    else:
+        values = await cache.mget_fields(keys, fields)
+    read_time = perf_counter() - start_time
+    # a sleep that is overdue but not woken yet counts too
+    probing.cancel()
+    probe.tick()
+
+    hit = set(k for k, _ in values)
+    remain = [k for k in keys if k not in hit]
+
+    if not stream:
+        origin_start = perf_counter()
+        loads.append(load(origin, flight, remain))
+    fresh = [item for items in await asyncio.gather(*loads) for item in items]
+    write_start = perf_counter()
+    await cache.mset(fresh, ttl=TTL)
+
+    total_time = perf_counter() - start_time
+    spans.reset(token)
+
+    # reader threads deserialize in parallel and their sum can exceed the
+    # read, the read is split in the ratio of their busy time
+    busy = spent.pop("reader", 0.0)
+    if busy > read_time:
+        spent["deserialize"] *= read_time / busy
+    spent["lookup"] = max(0.0, read_time - spent["deserialize"])
+    spent["origin"] = write_start - (origin_start or write_start)
+    spent["write"] = max(0.0, perf_counter() - write_start - spent["serialize"])
+    spent["total"] = total_time
+    phases = {phase: Histogram() for phase in PHASES}
+    for phase, h in phases.items():
+        h.record(spent[phase])
+
+    stats = {k: v - before.get(k, 0) for k, v in cache.stats().items()}
+    if flight is not None:
+        stats["coalesced"] = len(remain) - len(fresh)
+    return Result(
+        len(keys),
+        len(hit),
+        len(remain),
+        read_time,
+        total_time,
+        probe.worst,
+        stats,
+        phases,
+    )
+
+
+# long lived backends and single-flight layers of this worker process
+instances: dict[str, CacheBackend] = {}
+flights: dict[Origin, SingleFlight] = {}
+
+
+def start_sweeper(cache: CacheBackend) -> None:
+    # the writable handle of a file store drops expired entries in the
+    # background, wrappers keep their store in `db`
+    store = getattr(cache, "db", None)
+    if not isinstance(store, ExpiringCache):
+        store = cache
+    if (
+        isinstance(store, ExpiringCache)
+        and store.sweeps
+        and not store.read_only
+        and store.sweeper is None
+    ):
+        store.start_sweeper()
+
+
+def open_cache(
+    backend: type[CacheBackend], origin: Origin, read_only=False
+) -> CacheBackend:
+    # backends that refresh entries on their own fetch from the runner's origin
+    if issubclass(backend, RevalidatingCache):
+        return backend(read_only=read_only, origin=origin)
+    # sized by the instance that creates the segment, the warm-up one
+    if issubclass(backend, SharedMemoryCache):
+        return backend(read_only=read_only, capacity=ITEM_COUNT)
+    return backend(read_only=read_only)
+
+
+async def worker(args) -> Result:
+    name, idx, keys, origin, single_flight, fields, stream = args
+    backend = BACKENDS[name]
+
+    flight = None
+    if single_flight:
+        if origin not in flights:
+            flights[origin] = SingleFlight(origin)
+        flight = flights[origin]
+
+    if backend.long_lived:
+        if name not in instances:
+            instances[name] = open_cache(backend, origin)
+            start_sweeper(instances[name])
+        return await request(instances[name], keys, origin, flight, fields, stream)
+
+    # only one worker opens the file based stores writable, like the original scripts
+    cache = open_cache(backend, origin, read_only=idx != 0)
+    start_sweeper(cache)
+    try:
+        return await request(cache, keys, origin, flight, fields, stream)
+    finally:
+        cache.close()
+
+
+async def run(
+    name: str,
+    origin: Origin = fetch,
+    requests=REQUESTS,
+    workers=WORKERS,
+    single_flight=False,
+    fields: Collection[str] | None = None,
+    workload: list[Request] | None = None,
+    stream=False,
+) -> tuple[list[Result], float]:
+    backend = BACKENDS[name]
+    # the warm-up instance and every pool worker share one reader table
+    needed = 1 + backend.lmdb_readers(workers)
+    if needed > LMDBCache.max_readers:
+        raise ValueError(
+            f"{name}: {workers} workers need {needed} lmdb readers, max {LMDBCache.max_readers}"
+        )
+    backend.prepare()
+
+    item_keys = [str(i) for i in range(0, ITEM_COUNT)]
+    test_keys = [str(i) for i in range(0, KEY_SPACE)]
+
+    cache = open_cache(backend, origin)
+    items = await origin(item_keys)
+    start_time = perf_counter()
+    target = cache.bulk_target()
+    if target is not None:
+        bulk_load(target, items, ttl=TTL)
+        cache.bulk_loaded([k for k, _ in items])
+    else:
+        await cache.mset(items, ttl=TTL)
+    print(
+        f"{name:<22s} warm-up: {len(items)} items, {perf_counter() - start_time:.3f}s"
+    )
+
+    if workload is None:
+        batches = [sample(test_keys, REQUEST_SIZE) for _ in range(requests)]
+    else:
+        batches = [r.keys for r in workload]
+    testcases = [
+        (name, i, keys, origin, single_flight, fields, stream)
+        for i, keys in enumerate(batches)
+    ]
+
+    results = []
+    start_time = perf_counter()
+    if backend.process_local and single_flight:
+        # concurrent, otherwise there is nothing to coalesce
+        flight = SingleFlight(origin)
+        results = await asyncio.gather(
+            *(request(cache, t[2], origin, flight, fields, stream) for t in testcases)
+        )
+    elif backend.process_local:
+        # entries are not visible from other processes, so stay in this one
+        for _, _, keys, *_ in testcases:
+            results.append(
+                await request(cache, keys, origin, fields=fields, stream=stream)
+            )
+    else:
+        cache.close()
+        # stats are deltas of per process counters, so requests of a backend
+        # that keeps counters must not overlap. neither may requests that open
+        # an lmdb environment each, py-lmdb opens a path once per process
+        exclusive = backend.stats is not CacheBackend.stats or (
+            not backend.long_lived and backend.lmdb_readers(1) > 0
+        )
+        concurrency = 1 if exclusive else 16
+        async with Pool(workers, childconcurrency=concurrency) as pool:
+            async for result in pool.map(worker, testcases):
+                results.append(result)
+    wall_time = perf_counter() - start_time
+
+    if backend.process_local:
+        cache.close()
+    backend.cleanup()
+
+    return results, wall_time
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def report(name: str, results: list[Result]) -> None:
+    for r in results:
+        print(
+            f"{name:<22s}: total: {r.total}, hit: {r.hit}, miss: {r.miss}, read: {r.read_time: .5f}s, total: {r.total_time:.5f}s"
+        )
+
+
+def summary(rows: dict[str, tuple[list[Result], float]]) -> None:
+    print(
+        f"{'backend':<22s} {'hit':>6s} {'read avg':>10s} {'read max':>10s} {'p50':>10s} {'max':>10s} {'keys/s':>12s} {'req/s':>8s} {'read lag':>10s}"
+    )
+    for name, (results, wall_time) in rows.items():
+        reads = [r.read_time * 1000 for r in results]
+        totals = [r.total_time * 1000 for r in results]
+        keys = sum(r.total for r in results)
+        ratio = sum(r.hit for r in results) / keys
+        print(
+            f"{name:<22s} {ratio:>6.3f} {sum(reads) / len(reads):>8.3f}ms {max(reads):>8.3f}ms "
+            f"{percentile(totals, 0.5):>8.3f}ms {max(totals):>8.3f}ms "
+            f"{keys / wall_time:>12.0f} {len(results) / wall_time:>8.2f} "
+            f"{max(r.lag for r in results) * 1000:>8.3f}ms"
+        )
+
+    # every request brings its own histograms, from whichever worker ran it
+    print()
+    for name, (results, _) in rows.items():
+        merged = {phase: Histogram() for phase in PHASES}
+        for r in results:
+            for phase, h in r.phases.items():
+                merged[phase].merge(h)
+        latency_report(name, merged)
+    print()
+
+    for name, (results, _) in rows.items():
+        stats = Counter()
+        for r in results:
+            stats.update(r.stats)
+        if "l1_hit" in stats:
+            tiers(name, stats, sum(r.total for r in results), len(results))
+        if "admitted" in stats:
+            print(
+                f"{name:<22s} admitted: {stats['admitted']:.0f}, rejected: {stats['rejected']:.0f}, evicted: {stats['evicted']:.0f}"
+            )
+        if "avoided" in stats:
+            negatives = stats["avoided"] + stats["false_positive"]
+            print(
+                f"{name:<22s} bloom avoided {stats['avoided']:.0f} of {sum(r.total for r in results)} lookups, false positive rate: {stats['false_positive'] / max(negatives, 1):.4f}"
+            )
+        if "stale" in stats or "ahead_refresh" in stats:
+            print(
+                f"{name:<22s} served stale: {stats['stale']:.0f}, refreshed: {stats['refreshed']:.0f} "
+                f"(ahead {stats['ahead_refresh']:.0f}, stale {stats['stale_refresh']:.0f}), failed: {stats['refresh_failed']:.0f}"
+            )
+        if "coalesced" in stats:
+            misses = sum(r.miss for r in results)
+            print(
+                f"{name:<22s} single-flight saved {stats['coalesced']:.0f} of {misses} origin fetches"
+            )
+
+
+def tiers(name: str, stats: Counter, keys: int, requests: int) -> None:
+    print(
+        f"{name:<22s} l1 hit: {stats['l1_hit'] / keys:.3f} ({stats['l1_time'] / requests * 1000:.3f}ms), "
+        f"l2 hit: {stats['l2_hit'] / keys:.3f} ({stats['l2_time'] / requests * 1000:.3f}ms), "
+        f"origin: {stats['miss'] / keys:.3f}, l1 invalidated: {stats['invalidated']:.0f}"
+    )
+
+
+async def main(
+    names: list[str],
+    origin: Origin = fetch,
+    single_flight=False,
+    requests=REQUESTS,
+    workers=WORKERS,
+    fields: Collection[str] | None = None,
+    workload: list[Request] | None = None,
+    stream=False,
+) -> None:
+    rows = {}
+    for name in names:
+        results, wall_time = await run(
+            name, origin, requests, workers, single_flight, fields, workload, stream
+        )
+        report(name, results)
+        rows[name] = (results, wall_time)
+        print("------------------")
+
+    summary(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "backends", nargs="*", choices=list(BACKENDS), default=list(BACKENDS)
+    )
+    parser.add_argument(
+        "--single-flight",
+        action="store_true",
+        help="coalesce concurrent origin fetches of the same vendor ids",
+    )
+    parser.add_argument("--requests", type=int, default=REQUESTS)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument(
+        "--hot", action="store_true", help="read only the fields ranking needs"
+    )
+    parser.add_argument(
+        "--workload",
+        choices=["uniform", "zipf", "hotspot", "diurnal"],
+        help="the same generated request stream for every backend",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="fetch the misses of each decoded chunk while the rest decodes",
+    )
+    parser.add_argument(
+        "--trace",
+        help="replay the requests of a recorded trace, in order and as fast as "
+        "the workers take them, the recorded timestamps are not paced",
+    )
+    parser.add_argument(
+        "--record", help="save the requests of --workload or --trace as a trace"
+    )
+    args = parser.parse_args()
+    if args.record and not (args.workload or args.trace):
+        parser.error("--record needs --workload or --trace")
+
+    workload = None
+    if args.trace:
+        workload = list(replay(args.trace))
+    elif args.workload:
+        test_keys = [str(i) for i in range(0, KEY_SPACE)]
+        workload = generate(args.workload, test_keys, args.requests, REQUEST_SIZE)
+    if args.record:
+        record(args.record, workload)
+
+    asyncio.run(
+        main(
+            args.backends,
+            single_flight=args.single_flight,
+            requests=args.requests,
+            workers=args.workers,
+            fields=HOT_FIELDS if args.hot else None,
+            workload=workload,
+            stream=args.stream,
+        )
+    )
@@ -0,0 +1,191 @@
+import fcntl
+import math
+import os
+import struct
+from collections import Counter
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from backends import BoltDBCache, CacheBackend, LMDBCache, RedisCacheTest
+from shmcache import lock_path
+
+# segment header: magic, bit count, hash count
+HEADER = struct.Struct("<4sQI")
+MAGIC = b"VBLM"
+
+
+FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+SALT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def fmix(h: np.ndarray) -> np.ndarray:
+    # murmur3 finalizer, spreads the FNV state over all 64 bits
+    h = h ^ (h >> np.uint64(33))
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xC4CEB93FE53B9A87)
+    h ^= h >> np.uint64(33)
+    return h
+
+
+def key_hashes(keys: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    # two 64 bit hashes per key, the same in every process unlike hash().
+    # FNV-1a over the key bytes, one NumPy pass per byte column. the padding
+    # of shorter keys is skipped, so a hash doesn't depend on the batch
+    encoded = [k.encode() for k in keys]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(keys))
+    columns = np.array(encoded).view(np.uint8).reshape(len(keys), -1)
+    h = np.full(len(keys), FNV_OFFSET, dtype=np.uint64)
+    for i, column in enumerate(columns.T):
+        h = np.where(lengths > i, (h ^ column) * FNV_PRIME, h)
+    return fmix(h), fmix(h ^ SALT) | np.uint64(1)
+
+
+class BloomFilter:
+    # bit array in a shared memory segment, every pool worker tests and sets
+    # the same bits. readers never lock, setters serialize on a flock since
+    # setting a bit rewrites its whole byte
+    def __init__(self, name: str, capacity=1 << 20, error=0.01) -> None:
+        self.name = name
+        bits = int(-capacity * math.log(error) / math.log(2) ** 2)
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        try:
+            self.shm = SharedMemory(name=name)
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except FileNotFoundError:
+            self.shm = SharedMemory(
+                name=name, create=True, size=HEADER.size + (bits + 7) // 8
+            )
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+            HEADER.pack_into(self.shm.buf, 0, MAGIC, bits, hashes)
+
+        magic, self.bits, self.hashes = HEADER.unpack_from(self.shm.buf, 0)
+        assert magic == MAGIC, f"{name} is not a bloom filter segment"
+        self.array = np.ndarray(
+            ((self.bits + 7) // 8,), dtype=np.uint8, buffer=self.shm.buf[HEADER.size :]
+        )
+        self.lock = os.open(lock_path(name), os.O_RDWR | os.O_CREAT, 0o666)
+
+    @classmethod
+    def unlink(cls, name: str) -> None:
+        # the segment and its lock file, once no process has the filter open
+        try:
+            os.remove(lock_path(name))
+        except FileNotFoundError:
+            pass
+        try:
+            shm = SharedMemory(name=name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+    def positions(self, keys: list[str]) -> np.ndarray:
+        # double hashing, one row per hash function
+        h1, h2 = key_hashes(keys)
+        i = np.arange(self.hashes, dtype=np.uint64)[:, None]
+        return (h1 + i * h2) % np.uint64(self.bits)
+
+    def contains(self, keys: list[str]) -> np.ndarray:
+        # False means certainly absent
+        if not keys:
+            return np.zeros(0, dtype=bool)
+        positions = self.positions(keys)
+        bits = self.array[positions >> np.uint64(3)] >> (positions & np.uint64(7))
+        return (bits & 1).astype(bool).all(axis=0)
+
+    def add(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        positions = self.positions(keys).ravel()
+        masks = np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+        fcntl.flock(self.lock, fcntl.LOCK_EX)
+        try:
+            np.bitwise_or.at(self.array, positions >> np.uint64(3), masks)
+        finally:
+            fcntl.flock(self.lock, fcntl.LOCK_UN)
+
+    def clear(self) -> None:
+        self.array[:] = 0
+
+    def close(self) -> None:
+        os.close(self.lock)
+        # the array is a view into the segment, it has to go first
+        del self.array
+        self.shm.close()
+
+
+class BloomCache(CacheBackend):
+    # keys that were never written are answered from the filter without a
+    # lookup in `store`. the filter only grows, expired and evicted keys stay
+    # in it as false positives until a bulk load rebuilds it
+    store: type[CacheBackend]
+
+    def __init__(self, read_only=False) -> None:
+        self.db = self.store(read_only=read_only)
+        self.filter = BloomFilter(f"bloom-{self.store.__name__}")
+        self.counters = Counter()
+
+    @classmethod
+    def prepare(cls) -> None:
+        cls.store.prepare()
+        BloomFilter.unlink(f"bloom-{cls.store.__name__}")
+
+    @classmethod
+    def lmdb_readers(cls, workers: int) -> int:
+        return cls.store.lmdb_readers(workers)
+
+    @classmethod
+    def cleanup(cls) -> None:
+        cls.store.cleanup()
+        BloomFilter.unlink(f"bloom-{cls.store.__name__}")
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        maybe = self.filter.contains(keys)
+        candidates = [k for k, m in zip(keys, maybe.tolist()) if m]
+        ret = await self.db.mget(candidates) if candidates else []
+
+        self.counters["avoided"] += len(keys) - len(candidates)
+        self.counters["false_positive"] += len(candidates) - len(ret)
+        return ret
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        await self.db.mset(pairs, ttl=ttl)
+        # read only file stores drop the write
+        if not getattr(self.db, "read_only", False):
+            self.filter.add([k for k, _ in pairs])
+
+    def rebuild(self, keys: list[str]) -> None:
+        # after a bulk load, with every key the store holds
+        self.filter.clear()
+        self.filter.add(keys)
+
+    def bulk_target(self) -> LMDBCache | None:
+        return self.db.bulk_target()
+
+    def bulk_loaded(self, keys: list[str]) -> None:
+        self.db.bulk_loaded(keys)
+        self.rebuild(keys)
+
+    def stats(self) -> dict[str, float]:
+        return dict(self.counters)
+
+    def close(self) -> None:
+        self.filter.close()
+        self.db.close()
+
+
+class BloomLMDBCache(BloomCache):
+    store = LMDBCache
+
+
+class BloomBoltDBCache(BloomCache):
+    store = BoltDBCache
+
+
+class BloomRedisCache(BloomCache):
+    store = RedisCacheTest
@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+from operator import itemgetter
+from time import perf_counter
+from typing import Any
+
+from backends import EXPIRY, LMDBCache, LMDBMsgpackCache, expires_at
+from origin import fetch
+
+
+def encode(
+    cache_class: type[LMDBCache], pairs: list[tuple[str, Any]]
+) -> list[tuple[bytes, bytes]]:
+    serializer = cache_class.make_serializer()
+    return [(k.encode(), serializer.dumps(v)) for k, v in pairs]
+
+
+def bulk_load(
+    cache: LMDBCache,
+    pairs: list[tuple[str, Any]],
+    ttl: int | None = None,
+    processes: int | None = None,
+    chunk_size=20000,
+) -> dict[str, float]:
+    # values are encoded in spawned processes, then written in key order with
+    # MDB_APPEND, which skips the b-tree search and fills every leaf page
+    processes = processes or os.cpu_count() or 1
+
+    start_time = perf_counter()
+    if processes == 1:
+        # shipping the encoded values back costs more than a single core saves
+        encoded = encode(type(cache), pairs)
+    else:
+        # spawned, not forked: the caller may be inside a running event loop
+        # with the environment open, and a fork would copy its locks, threads
+        # and LMDB handles in whatever state they are. the children only see
+        # their share of the pairs
+        context = multiprocessing.get_context("spawn")
+        step = -(-len(pairs) // processes)
+        shares = [
+            (type(cache), pairs[i : i + step]) for i in range(0, len(pairs), step)
+        ]
+        with context.Pool(len(shares)) as pool:
+            encoded = [item for part in pool.starmap(encode, shares) for item in part]
+    encode_time = perf_counter() - start_time
+
+    start_time = perf_counter()
+    encoded.sort(key=itemgetter(0))
+    header = EXPIRY.pack(expires_at(ttl))
+
+    for i in range(0, len(encoded), chunk_size):
+        chunk = encoded[i : i + chunk_size]
+        with cache.db.begin(write=True) as txn:
+            data = txn.cursor(db=cache.data)
+            # append only works past the last key, an older load falls back
+            # to ordinary puts
+            append = not data.last() or data.key() < chunk[0][0]
+            data.putmulti(((k, header + v) for k, v in chunk), append=append)
+
+            if ttl:
+                index = txn.cursor(db=cache.expiry)
+                entries = [(header + k, b"") for k, _ in chunk]
+                append = not index.last() or index.key() < entries[0][0]
+                index.putmulti(entries, append=append)
+    write_time = perf_counter() - start_time
+
+    return {"encode": encode_time, "write": write_time}
+
+
+def report(name: str, cache: LMDBCache, count: int, elapsed: float) -> None:
+    with cache.db.begin() as txn:
+        stat = txn.stat(cache.data)
+    pages = stat["leaf_pages"] + stat["branch_pages"] + stat["overflow_pages"]
+    # with writemap the file is as large as the map, only pages up to the last
+    # one written are in use
+    used = (cache.db.info()["last_pgno"] + 1) * stat["psize"]
+    size = os.path.getsize(os.path.join(cache.path, "data.mdb"))
+    print(
+        f"{name:<10s}: {count / elapsed:>9.0f} items/s, {elapsed:.3f}s, depth: {stat['depth']}, "
+        f"pages: {pages} (leaf {stat['leaf_pages']}, overflow {stat['overflow_pages']}), "
+        f"used: {used / 1024 / 1024:.1f}MB, file: {size / 1024 / 1024:.1f}MB"
+    )
+
+
+async def main(
+    cache_class: type[LMDBCache], count: int, ttl: int, processes: int | None
+) -> None:
+    pairs = await fetch([str(i) for i in range(count)])
+
+    cache_class.prepare()
+    cache = cache_class()
+    start_time = perf_counter()
+    await cache.mset(pairs, ttl=ttl)
+    report("mset", cache, count, perf_counter() - start_time)
+    cache.close()
+
+    cache_class.prepare()
+    cache = cache_class()
+    start_time = perf_counter()
+    times = bulk_load(cache, pairs, ttl=ttl, processes=processes)
+    report("bulk load", cache, count, perf_counter() - start_time)
+    print(f"bulk load : encode: {times['encode']:.3f}s, write: {times['write']:.3f}s")
+    cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--msgpack", action="store_true")
+    parser.add_argument("--count", type=int, default=300000)
+    parser.add_argument("--ttl", type=int, default=60)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    cache_class = LMDBMsgpackCache if args.msgpack else LMDBCache
+    asyncio.run(main(cache_class, args.count, args.ttl, args.processes))
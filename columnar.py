@@ -0,0 +1,371 @@
+# a standalone experiment: the store holds Restaurant ranking fields while the
+# benchmark backends cache whole Vendor documents, so none of them uses it.
+# main() compares a ranking read against unpickling the same restaurants
+import pickle
+import random
+from time import perf_counter
+from types import NoneType, UnionType
+from typing import Any, get_args, get_origin, get_type_hints
+
+import msgspec
+import numpy as np
+
+from restaurant import Restaurant
+
+
+# vendor counters and fees fit in 32 bits, numpy raises OverflowError if not
+DTYPES = {int: np.int32, float: np.float64, bool: np.bool_}
+
+
+def unwrap(tp) -> tuple[Any, bool]:
+    # `int | None` -> (int, True)
+    if isinstance(tp, UnionType):
+        args = [a for a in get_args(tp) if a is not NoneType]
+        return args[0], True
+    return tp, False
+
+
+class StringPool:
+    # every distinct string is stored once and referenced by its code, -1 is None
+    def __init__(self) -> None:
+        self.codes: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def encode(self, value: str | None) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int) -> str | None:
+        return None if code < 0 else self.values[code]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(v.encode()) for v in self.values)
+
+
+class Elements:
+    # flat, growable element array shared by all rows of a list/dict field
+    def __init__(self, dtype, capacity=1024) -> None:
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values: list[Any]) -> int:
+        start = self.size
+        end = start + len(values)
+        if end > len(self.data):
+            self.data = np.resize(self.data, max(end, len(self.data) * 2))
+        self.data[start:end] = values
+        self.size = end
+        return start
+
+
+class Field:
+    def __init__(self, name: str, tp: Any) -> None:
+        self.name = name
+        self.item_is_str = False
+        tp, self.optional = unwrap(tp)
+        self.origin = get_origin(tp) or tp
+
+        if self.origin in DTYPES:
+            self.kind = "scalar"
+            self.dtype = DTYPES[self.origin]
+        elif self.origin is str:
+            self.kind = "string"
+            self.dtype = np.int32
+        elif self.origin is list:
+            (item,) = get_args(tp)
+            self.kind = "list"
+            self.dtype = np.int32 if item is str else DTYPES[item]
+            self.item_is_str = item is str
+        elif self.origin is dict:
+            key, value = get_args(tp)
+            assert key is str, f"{name}: only str keyed dicts are supported"
+            self.kind = "dict"
+            self.dtype = DTYPES[value]
+        else:
+            raise TypeError(f"{name}: unsupported type {tp!r}")
+
+
+# struct-of-arrays store for msgspec structs: one NumPy column per scalar field,
+# strings dictionary encoded into a shared pool, lists and dicts as a
+# (start, length) span per row into a flat element array
+class ColumnarStore:
+    def __init__(
+        self, schema: type[msgspec.Struct] = Restaurant, capacity=1024
+    ) -> None:
+        self.schema = schema
+        self.fields = [Field(n, t) for n, t in get_type_hints(schema).items()]
+        self.field_of = {f.name: f for f in self.fields}
+        self.pool = StringPool()
+
+        self.size = 0
+        self.capacity = capacity
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.row_of: dict[int, int] = {}
+        self.sorted_ids: np.ndarray | None = None
+        self.sorted_rows: np.ndarray | None = None
+
+        self.columns: dict[str, np.ndarray] = {}
+        self.nulls: dict[str, np.ndarray] = {}
+        self.spans: dict[str, np.ndarray] = {}
+        self.elements: dict[str, Elements] = {}
+        self.keys: dict[str, Elements] = {}
+
+        for f in self.fields:
+            if f.kind in ("scalar", "string"):
+                self.columns[f.name] = np.empty(capacity, dtype=f.dtype)
+            else:
+                self.spans[f.name] = np.empty((capacity, 2), dtype=np.uint32)
+                self.elements[f.name] = Elements(f.dtype)
+                if f.kind == "dict":
+                    self.keys[f.name] = Elements(np.int32)
+            if f.optional and f.kind != "string":
+                self.nulls[f.name] = np.zeros(capacity, dtype=np.bool_)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def reserve(self, size: int) -> None:
+        if size <= self.capacity:
+            return
+        capacity = max(size, self.capacity * 2)
+        self.ids = np.resize(self.ids, capacity)
+        for store in (self.columns, self.nulls):
+            for name, column in store.items():
+                store[name] = np.resize(column, capacity)
+        for name, spans in self.spans.items():
+            self.spans[name] = np.resize(spans, (capacity, 2))
+        self.capacity = capacity
+
+    def rows_for(self, items: list[msgspec.Struct]) -> np.ndarray:
+        # existing ids are overwritten in place, new ids are appended
+        rows = np.empty(len(items), dtype=np.int64)
+        size = self.size
+        for i, item in enumerate(items):
+            row = self.row_of.get(item.id)
+            if row is None:
+                row = self.row_of[item.id] = size
+                size += 1
+            rows[i] = row
+        self.reserve(size)
+        self.size = size
+        return rows
+
+    def mset(self, items: list[msgspec.Struct]) -> None:
+        if not items:
+            return
+
+        rows = self.rows_for(items)
+        self.ids[rows] = [item.id for item in items]
+
+        for f in self.fields:
+            values = [getattr(item, f.name) for item in items]
+
+            if f.name in self.nulls:
+                self.nulls[f.name][rows] = [v is None for v in values]
+
+            if f.kind == "scalar":
+                self.columns[f.name][rows] = [0 if v is None else v for v in values]
+            elif f.kind == "string":
+                self.columns[f.name][rows] = [self.pool.encode(v) for v in values]
+            else:
+                # replaced spans are not reclaimed, rebuild the store to compact
+                spans = self.spans[f.name]
+                elements = self.elements[f.name]
+                for row, value in zip(rows, values):
+                    value = value or ()
+                    if f.kind == "dict":
+                        codes = [self.pool.encode(k) for k in value]
+                        self.keys[f.name].extend(codes)
+                        value = list(value.values())
+                    elif f.item_is_str:
+                        value = [self.pool.encode(v) for v in value]
+                    spans[row] = (elements.extend(value), len(value))
+
+        self.sorted_ids = None
+
+    def index(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.sorted_ids is None:
+            ids = self.ids[: self.size]
+            self.sorted_rows = np.argsort(ids, kind="stable")
+            self.sorted_ids = ids[self.sorted_rows]
+        return self.sorted_ids, self.sorted_rows
+
+    def mget(self, ids) -> "Batch":
+        keys = np.asarray(ids, dtype=np.int64)
+        sorted_ids, sorted_rows = self.index()
+        if not len(sorted_ids):
+            return Batch(self, keys[:0], keys[:0], keys)
+
+        pos = np.searchsorted(sorted_ids, keys)
+        pos[pos == len(sorted_ids)] = 0
+        found = sorted_ids[pos] == keys
+        # in row order, gathers walk the columns forward and adjacent rows
+        # are read as one slice
+        rows = sorted_rows[pos[found]]
+        order = np.argsort(rows, kind="stable")
+        return Batch(self, keys[found][order], rows[order], keys[~found])
+
+    @property
+    def nbytes(self) -> int:
+        size = self.ids.nbytes + self.pool.nbytes
+        for store in (self.columns, self.nulls, self.spans):
+            size += sum(a.nbytes for a in store.values())
+        for store in (self.elements, self.keys):
+            size += sum(e.data.nbytes for e in store.values())
+        return size
+
+
+# rows matched by ColumnarStore.mget, a column is gathered with one vectorized
+# take when it is first read so ranking only pays for the fields it uses. rows
+# that form one run are a slice, and every column read is a view into the
+# store instead of a copy. views see later writes to their rows
+class Batch:
+    def __init__(self, store: ColumnarStore, ids, rows, missing) -> None:
+        self.store = store
+        self.ids = ids
+        self.rows = rows
+        self.missing = missing
+        self.gathered: dict[str, np.ndarray] = {}
+
+        self.run: slice | None = None
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            self.run = slice(int(rows[0]), int(rows[-1]) + 1)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def gather(self, array: np.ndarray) -> np.ndarray:
+        if self.run is not None:
+            return array[self.run]
+        return array.take(self.rows, axis=0)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        column = self.gathered.get(name)
+        if column is None:
+            column = self.gathered[name] = self.gather(self.store.columns[name])
+        return column
+
+    def isnull(self, name: str) -> np.ndarray:
+        if name in self.store.nulls:
+            return self.gather(self.store.nulls[name])
+        return self[name] < 0
+
+    def values(self, name: str) -> list[Any]:
+        # python objects for one field, needed for strings, lists and dicts
+        store = self.store
+        field = store.field_of[name]
+        nulls = self.isnull(name) if field.optional else np.zeros(len(self), np.bool_)
+
+        if field.kind == "scalar":
+            return [None if n else v for v, n in zip(self[name].tolist(), nulls)]
+        if field.kind == "string":
+            return [store.pool.decode(c) for c in self[name].tolist()]
+
+        ret = []
+        data = store.elements[name].data
+        for (start, length), null in zip(
+            self.gather(store.spans[name]).tolist(), nulls
+        ):
+            if null:
+                ret.append(None)
+                continue
+            items = data[start : start + length].tolist()
+            if field.kind == "dict":
+                codes = store.keys[name].data[start : start + length].tolist()
+                ret.append({store.pool.decode(c): v for c, v in zip(codes, items)})
+            elif field.item_is_str:
+                ret.append([store.pool.decode(c) for c in items])
+            else:
+                ret.append(items)
+        return ret
+
+    def to_structs(self) -> list[msgspec.Struct]:
+        # slow path for callers that need whole documents
+        fields = [f.name for f in self.store.fields]
+        columns = [self.values(name) for name in fields]
+        return [
+            self.store.schema(**dict(zip(fields, values))) for values in zip(*columns)
+        ]
+
+
+# fields the ranking step reads
+RANKING_FIELDS = [
+    "distance",
+    "min_delivery_fee",
+    "estimated_delivery_time",
+    "order_count",
+    "review_count",
+    "review_avg",
+    "is_ypx",
+    "mov",
+    "score",
+    "discount_percent",
+    "has_discount",
+    "open",
+]
+
+
+def gen(id: int) -> Restaurant:
+    return Restaurant(
+        id=id,
+        distance=random.uniform(0, 10),
+        review_count=random.randint(0, 1000),
+        review_avg=random.uniform(0, 5),
+        score=random.random(),
+        franchise_id=random.choice([None, 80, 81]),
+        categories=random.sample(["중식", "한식", "테이크아웃", "카페디저트", "치킨"], 3),
+        taste_list=["매운맛", "단맛"],
+        taste_ratios=[0.7, 0.3],
+        label={"new": 1.0},
+        company_number=str(3330133333 + id),
+        open=True,
+    )
+
+
+def main() -> None:
+    # 300,000 restaurants, expected hit ratio = 33%
+    items = [gen(i) for i in range(300000)]
+    test_keys = list(range(300000 * 3))
+
+    pickled = {r.id: pickle.dumps(r, protocol=5) for r in items}
+
+    start_time = perf_counter()
+    store = ColumnarStore()
+    store.mset(items)
+    store.index()
+    print(f"load: {perf_counter() - start_time:.5f}s")
+
+    print(
+        f"pickle: {sum(len(v) for v in pickled.values()) / 1024 / 1024:.1f}MiB, "
+        f"columnar: {store.nbytes / 1024 / 1024:.1f}MiB"
+    )
+
+    # scattered ids are gathered, a run of ids loaded together is sliced
+    runs = [random.sample(test_keys, 8000) for _ in range(3)]
+    runs.append(list(range(100000, 108000)))
+    for testcases in runs:
+        start_time = perf_counter()
+        hits = [pickle.loads(pickled[k]) for k in testcases if k in pickled]
+        ranking = {f: [getattr(r, f) for r in hits] for f in RANKING_FIELDS}
+        pickle_time = perf_counter() - start_time
+
+        start_time = perf_counter()
+        batch = store.mget(testcases)
+        ranking = {f: batch[f] for f in RANKING_FIELDS}
+        columnar_time = perf_counter() - start_time
+
+        assert set(batch.ids.tolist()) == set(r.id for r in hits)
+        print(
+            f"hit: {len(batch)}, miss: {len(batch.missing)}, pickle: {pickle_time * 1000:.3f}ms, columnar: {columnar_time * 1000:.3f}ms, "
+            f"views: {batch.run is not None}"
+        )
+
+
+if __name__ == "__main__":
+    main()
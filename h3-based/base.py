@@ -1,21 +1,61 @@
+import os
+import sys
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Iterator
 from geopy import distance
 from dataclasses import dataclass
 
+import numpy as np
+
 import redis
 import zlib
 import pickle
 from aiocache.serializers import BaseSerializer
 
+# zdict and workload are shared with the root benchmark. appended, so the
+# modules of this directory still come first
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency import timed
+from zdict import ZDictCodec
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def distances(origin: "Location", lats, lngs, mode="haversine") -> np.ndarray:
+    # km from origin to every (lat, lng). haversine is one NumPy pass, geodesic
+    # is the WGS84 solver per pair and only worth it when accuracy matters
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+
+    if mode == "geodesic":
+        start = (origin.lat, origin.lng)
+        return np.fromiter(
+            (distance.geodesic(start, p).km for p in zip(lats.flat, lngs.flat)),
+            dtype=np.float64,
+            count=lats.size,
+        ).reshape(lats.shape)
+
+    if mode != "haversine":
+        raise ValueError(f"unknown distance mode: {mode}")
+
+    lat1, lng1 = np.radians(origin.lat), np.radians(origin.lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
+
 
 @dataclass
 class Location:
     lat: float
     lng: float
 
-    def distance(self, other) -> float:
-        return distance.distance((self.lat, self.lng), (other.lat, other.lng)).km
+    def distance(self, other, mode="geodesic") -> float:
+        return float(distances(self, other.lat, other.lng, mode))
 
     def __str__(self) -> str:
         return f"{self.__class__.__name__}({self.lat:.6f}, {self.lng:.6f})"
@@ -24,19 +64,38 @@ class Location:
 class CompressionSerializer(BaseSerializer):
     DEFAULT_ENCODING = None
 
+    # with dictionaries, version -> zlib preset dictionary, values are written
+    # with the newest one and read with the one they name
+    def __init__(self, dictionaries: dict[int, bytes] | None = None) -> None:
+        super().__init__()
+        self.dictionaries = dictionaries
+        self.codec: Any = zlib
+        if dictionaries is not None:
+            self.codec = ZDictCodec()
+            self.codec.dictionaries.update(dictionaries)
+
+    @timed("serialize")
     def dumps(self, value: Any) -> Any:
-        return zlib.compress(pickle.dumps(value))
+        return self.codec.compress(pickle.dumps(value))
 
+    @timed("deserialize")
     def loads(self, value: Any) -> Any:
         if value is None:
             return None
-        return pickle.loads(zlib.decompress(value))
+        return pickle.loads(self.codec.decompress(value))
+
+
+# shared by every cache of the process instead of a pool per instance
+POOL = redis.ConnectionPool(host="localhost", port=6379, db=0, max_connections=32)
 
 
 class BaseRedisCache(ABC):
-    def __init__(self) -> None:
-        self.serializer = CompressionSerializer()
-        self.db = redis.Redis(host="localhost", port=6379, db=0)
+    # seconds an overlay outlives its last patch
+    patch_ttl = 300
+
+    def __init__(self, dictionaries: dict[int, bytes] | None = None) -> None:
+        self.serializer = CompressionSerializer(dictionaries)
+        self.db = redis.Redis(connection_pool=POOL)
 
     @abstractmethod
     def mget(self, loc: Location, keys: set[str]) -> list[tuple[str, Any]]:
@@ -46,5 +105,80 @@ class BaseRedisCache(ABC):
     def mset(self, loc: Location, values: list[Any]) -> None:
         ...
 
+    def mget_stream(
+        self, loc: Location, keys: set[str]
+    ) -> Iterator[tuple[list[tuple[str, Any]], set[str]]]:
+        # hits as they decode, every key shows up once in either. a key can
+        # be in any cell of the ring, so misses are only known with the last
+        patched = self.db.exists(self.marker_key())
+        values = self.overlay(self.mget(loc, keys), patched)
+        yield values, keys - set(k for k, _ in values)
+
+    def patch_key(self, key: str) -> str:
+        return f"{self}_patch:{key}"
+
+    def marker_key(self) -> str:
+        # set with every patch and expiring with the newest overlay, readers
+        # fetch it with their cells and skip the overlay lookup without it
+        return f"{self}_patched"
+
+    def patch(self, patches: list[tuple[str, int, dict[str, Any]]]) -> int:
+        # fast changing fields go to an overlay of (version, fields) per vendor
+        # instead of into the cell blobs, each expiring `patch_ttl` after its
+        # last patch. a patch with a version not above the stored one is
+        # dropped. patches of a vendor are expected from a single producer in
+        # version order
+        ids = [k for k, _, _ in patches]
+        current = {
+            k: pickle.loads(v)
+            for k, v in zip(ids, self.db.mget([self.patch_key(k) for k in ids]))
+            if v is not None
+        }
+
+        changed = {}
+        applied = 0
+        for key, version, fields in patches:
+            if key in current and version <= current[key][0]:
+                continue
+            current[key] = (version, current.get(key, (0, {}))[1] | fields)
+            changed[key] = current[key]
+            applied += 1
+
+        if changed:
+            with self.db.pipeline(transaction=False) as pipe:
+                for key, value in changed.items():
+                    pipe.set(
+                        self.patch_key(key), pickle.dumps(value), ex=self.patch_ttl
+                    )
+                pipe.set(self.marker_key(), 1, ex=self.patch_ttl)
+                pipe.execute()
+        return applied
+
+    def retire(self, keys: list[str]) -> None:
+        # a full write carries every patch so far. overlays of the written
+        # vendors are emptied at their version, so older patches stay dropped
+        names = [self.patch_key(k) for k in keys]
+        current = [
+            (name, pickle.loads(v)[0])
+            for name, v in zip(names, self.db.mget(names))
+            if v is not None
+        ]
+        if current:
+            with self.db.pipeline(transaction=False) as pipe:
+                for name, version in current:
+                    pipe.set(name, pickle.dumps((version, {})), keepttl=True)
+                pipe.execute()
+
+    def overlay(
+        self, hits: list[tuple[str, Any]], patched=True
+    ) -> list[tuple[str, Any]]:
+        if not hits or not patched:
+            return hits
+        patches = self.db.mget([self.patch_key(k) for k, _ in hits])
+        return [
+            (k, v if p is None else v | pickle.loads(p)[1])
+            for (k, v), p in zip(hits, patches)
+        ]
+
     def __str__(self) -> str:
         return self.__class__.__name__
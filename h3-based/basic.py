@@ -48,6 +48,7 @@ class BasicRedisCache(BaseRedisCache):
 
         data = self.serializer.dumps(will_be_cached)
         self.db.set(name, data)
+        self.retire([k for k, _ in values])
 
     def __str__(self) -> str:
         return f"{self.__class__.__name__}({self.resolution}, {self.cache_limit})"
@@ -0,0 +1,113 @@
+import h3
+from collections import Counter
+from typing import Any
+
+
+def squared(point: tuple[float, float], lat: float, lng: float) -> float:
+    # good enough to order cells by distance, not to measure it
+    return (point[0] - lat) ** 2 + (point[1] - lng) ** 2
+
+
+class FixedCells:
+    # every location is cached under its cell of one resolution
+    def __init__(self, resolution=6) -> None:
+        self.resolution = resolution
+
+    def cell(self, lat: float, lng: float) -> str:
+        return h3.geo_to_h3(lat, lng, self.resolution)
+
+    def ring(self, lat: float, lng: float, k: int) -> list[str]:
+        return list(h3.k_ring(self.cell(lat, lng), k))
+
+    def __str__(self) -> str:
+        return str(self.resolution)
+
+
+class CellMap:
+    # cells of mixed resolution that tile the restaurants. starting from
+    # `min_resolution`, a cell holding more than `target` restaurants is split
+    # into its children until it fits or `max_resolution` is reached, so dense
+    # areas get small cells and sparse ones stay on coarse cells
+    def __init__(
+        self,
+        restaurants: dict[str, Any],
+        target=2000,
+        min_resolution=4,
+        max_resolution=9,
+        max_cells=19,
+    ) -> None:
+        self.target = target
+        self.min_resolution = min_resolution
+        self.max_resolution = max_resolution
+        # a ring reads at most this many cells, the size of a k=2 ring
+        self.max_cells = max_cells
+
+        counts = Counter(
+            h3.geo_to_h3(v["lat"], v["lng"], max_resolution)
+            for v in restaurants.values()
+        )
+
+        totals = Counter()
+        for cell, n in counts.items():
+            for res in range(min_resolution, max_resolution + 1):
+                totals[h3.h3_to_parent(cell, res)] += n
+
+        self.cells: set[str] = set()
+        self.children: dict[str, list[str]] = {}
+        stack = list({h3.h3_to_parent(c, min_resolution) for c in counts})
+        while stack:
+            cell = stack.pop()
+            res = h3.h3_get_resolution(cell)
+            if totals[cell] <= target or res == max_resolution:
+                self.cells.add(cell)
+                continue
+            # empty children are kept too, so every location has exactly one cell
+            self.children[cell] = list(h3.h3_to_children(cell, res + 1))
+            stack.extend(self.children[cell])
+
+        # restaurants per mapped cell
+        self.sizes = {c: totals[c] for c in self.cells}
+
+        # finest cell -> the cell it is cached under
+        self.table = {c: self.ancestor(c) for c in counts}
+        self.rings: dict[tuple[str, int], list[str]] = {}
+
+    def ancestor(self, cell: str) -> str:
+        # the mapped cell containing `cell`, or its coarsest parent when it is
+        # outside the data
+        for res in range(self.min_resolution, h3.h3_get_resolution(cell) + 1):
+            parent = h3.h3_to_parent(cell, res)
+            if parent in self.cells:
+                return parent
+        return h3.h3_to_parent(cell, self.min_resolution)
+
+    def cell(self, lat: float, lng: float) -> str:
+        fine = h3.geo_to_h3(lat, lng, self.max_resolution)
+        cell = self.table.get(fine)
+        return cell if cell is not None else self.ancestor(fine)
+
+    def cover(self, cell: str) -> list[str]:
+        # mapped cells making up any cell of the hierarchy
+        if cell in self.children:
+            return [c for child in self.children[cell] for c in self.cover(child)]
+        return [self.ancestor(cell)]
+
+    def ring(self, lat: float, lng: float, k: int) -> list[str]:
+        # the k-ring of the location's cell at that cell's own resolution, with
+        # split neighbours replaced by their children and neighbours inside a
+        # coarser cell by that cell. a split neighbour can add dozens of small
+        # cells, past `max_cells` only the ones nearest to the cell are kept
+        cell = self.cell(lat, lng)
+        ring = self.rings.get((cell, k))
+        if ring is None:
+            covered = (c for n in h3.k_ring(cell, k) for c in self.cover(n))
+            ring = list(dict.fromkeys(covered))
+            if len(ring) > self.max_cells:
+                lat, lng = h3.h3_to_geo(cell)
+                ring.sort(key=lambda c: squared(h3.h3_to_geo(c), lat, lng))
+                ring = ring[: self.max_cells]
+            self.rings[cell, k] = ring
+        return ring
+
+    def __str__(self) -> str:
+        return f"adaptive-{self.target}"
@@ -1,13 +1,19 @@
 import json
 import random
 from typing import Any
-from heapq import heappush, heappop
 
-from base import Location
+import numpy as np
+
+from base import Location, distances
+from spatial import GEODESIC_ERROR, SpatialIndex
 
 
 class Testdata:
-    def __init__(self) -> None:
+    # geodesic by default like Location.distance, haversine is opt-in and
+    # may move restaurants near a cut-off in or out
+    def __init__(self, distance_mode="geodesic") -> None:
+        self.distance_mode = distance_mode
+
         self.dummy = {}
         with open("dummy.json", encoding="utf-8") as f:
             self.dummy = json.load(f)
@@ -16,17 +22,34 @@ class Testdata:
         self.boundary_km = 20
 
         self.restaurants = self.load()
+        self.index = SpatialIndex(self.restaurants)
         print(f"There are {len(self.restaurants)} restaurants")
 
     def load(self) -> dict[str, Any]:
-        restaurants = {}
+        ids, lats, lngs = [], [], []
         for line in open("data.csv", encoding="utf-8"):
             data = line.strip().split(",")
-            id = data[0]
-            loc = Location(float(data[1]), float(data[2]))
-            if self.kangnam.distance(loc) > self.boundary_km:
+            ids.append(data[0])
+            lats.append(float(data[1]))
+            lngs.append(float(data[2]))
+
+        # one haversine pass, in geodesic mode only the rows it can't place
+        # clearly inside or outside the boundary go through the solver
+        dist = distances(self.kangnam, lats, lngs)
+        if self.distance_mode != "haversine":
+            edge = np.flatnonzero(
+                np.abs(dist - self.boundary_km) <= self.boundary_km * GEODESIC_ERROR
+            )
+            lats, lngs = np.array(lats), np.array(lngs)
+            dist[edge] = distances(
+                self.kangnam, lats[edge], lngs[edge], self.distance_mode
+            )
+
+        restaurants = {}
+        for id, lat, lng, d in zip(ids, lats, lngs, dist.tolist()):
+            if d > self.boundary_km:
                 continue
-            restaurants[id] = self.gen(id, loc)
+            restaurants[id] = self.gen(id, Location(lat, lng))
 
         return restaurants
 
@@ -46,14 +69,12 @@ class Testdata:
         lng = round(lng, 6)
         return Location(lat, lng)
 
-    def get_nearest_restaurant_keys_from(self, loc: Location, limit=8000) -> set[str]:
-        queue = []
-        for k, v in self.restaurants.items():
-            dist = loc.distance(Location(v["lat"], v["lng"]))
-            heappush(queue, (-dist, k))
-            if len(queue) > limit:
-                heappop(queue)
-        return set([k for _, k in queue])
+    def get_nearest_restaurant_keys_from(
+        self, loc: Location, limit=8000, radius_km=None
+    ) -> set[str]:
+        return self.index.nearest(
+            loc, limit=limit, radius_km=radius_km, mode=self.distance_mode
+        )
 
     def fetch(self, keys: set[str]) -> list[tuple[str, Any]]:
         return [(k, self.restaurants[k]) for k in keys]
@@ -0,0 +1,93 @@
+from typing import Any, Iterator
+from collections import defaultdict
+
+from base import BaseRedisCache, Location
+from cells import CellMap, FixedCells
+
+
+class HashKRingCache(BaseRedisCache):
+    # every cell is a redis hash of vendor id -> compressed vendor, so a read
+    # only transfers the requested vendors instead of the whole cell blob
+    def __init__(
+        self,
+        resolution=6,
+        cache_limit=2000,
+        k=1,
+        cells: CellMap | None = None,
+        dictionaries: dict[int, bytes] | None = None,
+    ) -> None:
+        # single vendors barely compress alone, a trained dictionary helps
+        super().__init__(dictionaries)
+        self.resolution = resolution
+        self.cache_limit = cache_limit
+        self.k = k
+        self.cells = cells or FixedCells(resolution)
+
+    def cache_key(self, cell):
+        return f"{str(self)}_{cell}"
+
+    def cache_keys(self, loc: Location) -> list[str]:
+        return [self.cache_key(c) for c in self.cells.ring(loc.lat, loc.lng, self.k)]
+
+    def mget(self, loc: Location, keys: set[str]) -> list[tuple[str, Any]]:
+        return [hit for hits, _ in self.mget_stream(loc, keys) for hit in hits]
+
+    def mget_stream(
+        self, loc: Location, keys: set[str]
+    ) -> Iterator[tuple[list[tuple[str, Any]], set[str]]]:
+        if not keys:
+            return
+
+        # the cell of a vendor is unknown before reading it, so every cell of
+        # the ring is asked for every key, missing fields come back as nil
+        fields = list(keys)
+        pipe = self.db.pipeline(transaction=False)
+        for name in self.cache_keys(loc):
+            pipe.hmget(name, fields)
+        pipe.exists(self.marker_key())
+        replies = pipe.execute()
+        patched = replies.pop()
+
+        # decoded one cell at a time
+        remain = set(keys)
+        for values in replies:
+            hits = [
+                (k, self.serializer.loads(v))
+                for k, v in zip(fields, values)
+                if v is not None and k in remain
+            ]
+            remain.difference_update(k for k, _ in hits)
+            yield self.overlay(hits, patched), set()
+
+        yield [], remain
+
+    def mset(self, loc: Location, values: list[tuple[str, Any]]) -> None:
+        if not values:
+            return
+
+        caching = defaultdict(dict)
+        for key, value in values:
+            lat, lng = value["lat"], value["lng"]
+            cell = self.cache_key(self.cells.cell(lat, lng))
+            caching[cell][key] = value
+
+        names = list(caching)
+        pipe = self.db.pipeline(transaction=False)
+        for name in names:
+            pipe.hlen(name)
+        sizes = pipe.execute()
+
+        written = []
+        for name, size in zip(names, sizes):
+            room = self.cache_limit - size
+            if room <= 0:
+                continue
+            items = list(caching[name].items())[:room]
+            pipe.hset(name, mapping={k: self.serializer.dumps(v) for k, v in items})
+            written.extend(k for k, _ in items)
+        pipe.execute()
+        self.retire(written)
+
+    def __str__(self) -> str:
+        zdict = ", zdict" if self.serializer.dictionaries else ""
+        return f"{self.__class__.__name__}({self.cells}, {self.cache_limit}{zdict})"
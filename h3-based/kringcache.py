@@ -1,8 +1,12 @@
-import h3
-from typing import Any
+import queue
+import threading
+from typing import Any, Iterator
 from collections import defaultdict
 
+import redis
+
 from base import BaseRedisCache, Location
+from cells import CellMap, FixedCells
 
 
 """
@@ -13,11 +17,15 @@ res: 6, key: 1484, max: 4611, avg: 195.3787061994609, tot: 289942
 
 
 class KRingCache(BaseRedisCache):
-    def __init__(self, resolution=6, cache_limit=2000, k=1) -> None:
+    # with a CellMap the cells follow the density instead of `resolution`
+    def __init__(
+        self, resolution=6, cache_limit=2000, k=1, cells: CellMap | None = None
+    ) -> None:
         super().__init__()
         self.resolution = resolution
         self.cache_limit = cache_limit
         self.k = k
+        self.cells = cells or FixedCells(resolution)
 
         self.last_cached = None
 
@@ -25,27 +33,29 @@ class KRingCache(BaseRedisCache):
         return f"{str(self)}_{cell}"
 
     def cache_keys(self, loc: Location) -> list[str]:
-        cell = h3.geo_to_h3(loc.lat, loc.lng, self.resolution)
-        return [self.cache_key(k) for k in h3.k_ring(cell, k=self.k)]
+        return [self.cache_key(c) for c in self.cells.ring(loc.lat, loc.lng, self.k)]
 
     def mget(self, loc: Location, keys: set[str]) -> list[tuple[str, Any]]:
+        return [hit for hits, _ in self.mget_stream(loc, keys) for hit in hits]
+
+    def mget_stream(
+        self, loc: Location, keys: set[str]
+    ) -> Iterator[tuple[list[tuple[str, Any]], set[str]]]:
         names = self.cache_keys(loc)
-        values = self.db.mget(names)
+        values = self.db.mget(names + [self.marker_key()])
+        patched = values.pop() is not None
         self.last_cached = values
 
-        if not values:
-            return []
-
-        ret = []
+        # one cell blob at a time
+        remain = set(keys)
         for value in values:
             if value is None:
                 continue
-            data = self.serializer.loads(value)
-            for k, v in data:
-                if k in keys:
-                    ret.append((k, v))
+            hits = [(k, v) for k, v in self.serializer.loads(value) if k in remain]
+            remain.difference_update(k for k, _ in hits)
+            yield self.overlay(hits, patched), set()
 
-        return ret
+        yield [], remain
 
     def mset(self, loc: Location, values: list[tuple[str, Any]]) -> None:
         if not values:
@@ -55,11 +65,11 @@ class KRingCache(BaseRedisCache):
         caching = defaultdict(list)
         for key, value in values:
             lat, lng = value["lat"], value["lng"]
-            cell = self.cache_key(h3.geo_to_h3(lat, lng, self.resolution))
+            cell = self.cache_key(self.cells.cell(lat, lng))
             caching[cell].append((key, value))
             duplicate[cell].add(key)
 
-        names = self.cache_key(loc)
+        names = self.cache_keys(loc)
         cached = self.last_cached
 
         for cell, payload in zip(names, cached):
@@ -77,6 +87,120 @@ class KRingCache(BaseRedisCache):
 
         compressed = {k: self.serializer.dumps(v) for k, v in caching.items()}
         self.db.mset(compressed)
+        self.retire([k for k, _ in values])
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}({self.cells}, {self.cache_limit})"
+
+
+class SegmentedKRingCache(KRingCache):
+    # writes append a compressed batch to a per cell list instead of rewriting
+    # the cell, a background thread folds the list back into the base blob
+    def __init__(
+        self,
+        resolution=6,
+        cache_limit=2000,
+        k=1,
+        cells: CellMap | None = None,
+        compact_threshold=8,
+    ) -> None:
+        super().__init__(resolution, cache_limit, k, cells)
+        self.compact_threshold = compact_threshold
+
+        self.pending: set[str] = set()
+        self.compactions = queue.Queue()
+        threading.Thread(target=self.compactor, daemon=True).start()
+
+    def segment_key(self, name: str) -> str:
+        return f"{name}:segments"
+
+    def merge(self, payloads: list[bytes]) -> dict[str, Any]:
+        # oldest first, so a later segment overrides an earlier value
+        merged = {}
+        for payload in payloads:
+            for key, value in self.serializer.loads(payload):
+                merged.pop(key, None)
+                merged[key] = value
+        return merged
+
+    def mget_stream(
+        self, loc: Location, keys: set[str]
+    ) -> Iterator[tuple[list[tuple[str, Any]], set[str]]]:
+        names = self.cache_keys(loc)
+
+        pipe = self.db.pipeline(transaction=False)
+        for name in names:
+            pipe.get(name)
+            pipe.lrange(self.segment_key(name), 0, -1)
+        pipe.exists(self.marker_key())
+        replies = pipe.execute()
+        patched = replies.pop()
+
+        # one cell at a time, its base blob with the segments appended since
+        remain = set(keys)
+        for base, segments in zip(replies[::2], replies[1::2]):
+            payloads = ([base] if base is not None else []) + segments
+            if not payloads:
+                continue
+            hits = [(k, v) for k, v in self.merge(payloads).items() if k in remain]
+            remain.difference_update(k for k, _ in hits)
+            yield self.overlay(hits, patched), set()
+
+        yield [], remain
+
+    def mset(self, loc: Location, values: list[tuple[str, Any]]) -> None:
+        if not values:
+            return
+
+        caching = defaultdict(list)
+        for key, value in values:
+            lat, lng = value["lat"], value["lng"]
+            cell = self.cache_key(self.cells.cell(lat, lng))
+            caching[cell].append((key, value))
+
+        names = list(caching)
+        pipe = self.db.pipeline(transaction=False)
+        for name in names:
+            pipe.rpush(self.segment_key(name), self.serializer.dumps(caching[name]))
+
+        for name, length in zip(names, pipe.execute()):
+            if length >= self.compact_threshold and name not in self.pending:
+                self.pending.add(name)
+                self.compactions.put(name)
+        self.retire([k for k, _ in values])
+
+    def compactor(self) -> None:
+        while True:
+            name = self.compactions.get()
+            try:
+                self.compact(name)
+            finally:
+                self.pending.discard(name)
+
+    def compact(self, name: str) -> None:
+        segment_key = self.segment_key(name)
+        with self.db.pipeline() as pipe:
+            while True:
+                try:
+                    # another compactor folding the same cell makes EXEC fail,
+                    # appends only grow the list tail and are kept by LTRIM
+                    pipe.watch(name)
+                    base = pipe.get(name)
+                    segments = pipe.lrange(segment_key, 0, -1)
+                    if not segments:
+                        return
+
+                    payloads = ([base] if base is not None else []) + segments
+                    merged = list(self.merge(payloads).items())
+                    merged = merged[-self.cache_limit :]
+
+                    pipe.multi()
+                    pipe.set(name, self.serializer.dumps(merged))
+                    pipe.ltrim(segment_key, len(segments), -1)
+                    pipe.execute()
+                    return
+                except redis.WatchError:
+                    continue
 
     def __str__(self) -> str:
-        return f"{self.__class__.__name__}({self.resolution}, {self.cache_limit})"
+        return f"{self.__class__.__name__}({self.cells}, {self.cache_limit})"
@@ -1,48 +1,123 @@
-from collections import defaultdict
+import argparse
+import pickle
+from collections import Counter, defaultdict
 from time import perf_counter
+
+# first, it puts the root modules on the path
 from base import BaseRedisCache, Location
 from basic import BasicRedisCache
+from cells import CellMap
 from data import Testdata
-from kringcache import KRingCache
+from hashcache import HashKRingCache
+from kringcache import KRingCache, SegmentedKRingCache
+from latency import PHASES, Histogram, report, spans
+from workload import DAY, Diurnal, Hotspots, Request, record, replay
+from zdict import train
 
 
 def process(data: Testdata, cache: BaseRedisCache, loc: Location, rids: set[str]):
+    # the serializers add their time to the spans, the rest of a phase is
+    # redis and the cell bookkeeping
+    spent = Counter()
+    token = spans.set(spent)
     start_time = perf_counter()
-    values = cache.mget(loc=loc, keys=rids)
+    values, remain = [], set()
+    for hits, misses in cache.mget_stream(loc=loc, keys=rids):
+        values.extend(hits)
+        remain |= misses
     read_time = (perf_counter() - start_time) * 1000
 
+    # the kring caches also decode their cells again to merge a write
+    decoded = spent["deserialize"]
+
     hit = set(k for k, _ in values)
-    remain = rids - hit
+    origin_start = perf_counter()
     items = data.fetch(remain)
 
-    start_time = perf_counter()
+    write_start = perf_counter()
     cache.mset(loc, items)
-    write_time = (perf_counter() - start_time) * 1000
+    write_time = (perf_counter() - write_start) * 1000
+    spans.reset(token)
+
+    coding = spent["serialize"] + spent["deserialize"] - decoded
+    spent["lookup"] = max(0.0, read_time / 1000 - decoded)
+    spent["origin"] = write_start - origin_start
+    spent["write"] = max(0.0, write_time / 1000 - coding)
+    spent["total"] = perf_counter() - start_time
 
     ret = [v for _, v in values] + [v for _, v in items]
     assert len(rids) == len(ret)
     assert rids == set([r["id"] for r in ret])
 
-    return (len(rids), len(hit), len(remain), read_time, write_time)
+    return (len(rids), len(hit), len(remain), read_time, write_time), spent
 
 
-def main() -> None:
-    data = Testdata()
+def workload(data: Testdata, kind: str, count: int) -> list[Request]:
+    # the keys follow from the location, so there is no zipf over keys here.
+    # locations of a trace are replayed with the keys recorded for them
+    times = [float(i) for i in range(count)]
+    if kind == "uniform":
+        locations = [data.gen_test_location() for _ in range(count)]
+    else:
+        locations = [Location(*p) for p in Hotspots().sample(count)]
+    if kind == "diurnal":
+        # the same arrivals as the root workload, a third of the peak rate
+        times = Diurnal(rate=3 * count / DAY).sample(count)
+
+    requests = []
+    for t, loc in zip(times, locations):
+        rids = data.get_nearest_restaurant_keys_from(loc, limit=8000)
+        requests.append(Request(t, loc.lat, loc.lng, sorted(rids)))
+    return requests
+
+
+def main(
+    kind="uniform",
+    count=10,
+    trace: str | None = None,
+    output: str | None = None,
+    distance_mode="geodesic",
+) -> None:
+    data = Testdata(distance_mode)
+
+    cells = CellMap(data.restaurants, target=2000)
+    sizes = [n for n in cells.sizes.values() if n]
+    print(
+        f"{cells}: key: {len(sizes)}, max: {max(sizes)}, avg: {sum(sizes) / len(sizes)}"
+    )
+
+    samples = [pickle.dumps(v) for v in list(data.restaurants.values())[:1000]]
+    dictionaries = {1: train(samples)}
 
     caches = [
         BasicRedisCache(resolution=5, cache_limit=5000),
         KRingCache(resolution=6, cache_limit=2000, k=1),
         KRingCache(resolution=6, cache_limit=1000, k=1),
+        HashKRingCache(resolution=6, cache_limit=2000, k=1),
+        SegmentedKRingCache(resolution=6, cache_limit=2000, k=1),
+        KRingCache(cache_limit=2000, k=1, cells=cells),
+        HashKRingCache(cache_limit=2000, k=1, cells=cells),
+        HashKRingCache(resolution=6, cache_limit=2000, k=1, dictionaries=dictionaries),
     ]
 
     stats = defaultdict(list)
-
-    for _ in range(10):
-        loc = data.gen_test_location()
-        rids = data.get_nearest_restaurant_keys_from(loc, limit=8000)
+    phases = defaultdict(lambda: {phase: Histogram() for phase in PHASES})
+
+    if trace is not None:
+        requests = list(replay(trace))
+    else:
+        requests = workload(data, kind, count)
+    if output is not None:
+        record(output, requests)
+
+    for r in requests:
+        loc = Location(r.lat, r.lng)
+        rids = set(r.keys)
         print(f"{loc}")
         for i, c in enumerate(caches):
-            req, hit, miss, read_time, write_time = process(data, c, loc, rids)
+            (req, hit, miss, read_time, write_time), spent = process(data, c, loc, rids)
+            for phase, h in phases[i].items():
+                h.record(spent[phase])
             print(
                 f"{str(c):<40s}: req: {req}, hit: {hit}, miss: {miss}, ratio: {hit/(req+0.000001):.3f}, read: {read_time: .5f}ms, write: {write_time:.5f}ms"
             )
@@ -60,9 +135,34 @@ def main() -> None:
         max_w_time = max(w for _, _, _, _, w in stat)
 
         print(
-                f"{str(caches[i]):<40s} - avg_r_time: {avg_r_time:.3f}ms, avg_w_time: {avg_w_time:.3f}ms, avg_hit_ratio: {avg_ratio:.3f}, max_r_time: {max_r_time:.3f}, max_w_time: {max_w_time:.3f}"
+            f"{str(caches[i]):<40s} - avg_r_time: {avg_r_time:.3f}ms, avg_w_time: {avg_w_time:.3f}ms, avg_hit_ratio: {avg_ratio:.3f}, max_r_time: {max_r_time:.3f}, max_w_time: {max_w_time:.3f}"
         )
 
+    # tails per phase, averages hide the few slow lookups that decide the
+    # page time
+    print("")
+    for i, histograms in phases.items():
+        report(str(caches[i]), histograms)
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workload", choices=["uniform", "hotspot", "diurnal"], default="uniform"
+    )
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument(
+        "--trace",
+        help="replay the requests of a recorded trace in order, the recorded "
+        "timestamps are not paced",
+    )
+    parser.add_argument("--record", help="save the requests as a trace")
+    parser.add_argument(
+        "--haversine",
+        action="store_true",
+        help="spherical distances, faster but may differ near a cut-off",
+    )
+    args = parser.parse_args()
+
+    distance_mode = "haversine" if args.haversine else "geodesic"
+    main(args.workload, args.requests, args.trace, args.record, distance_mode)
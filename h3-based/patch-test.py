@@ -0,0 +1,66 @@
+import random
+
+from base import BaseRedisCache, Location
+from hashcache import HashKRingCache
+from kringcache import KRingCache, SegmentedKRingCache
+
+
+def vendors(center: Location, count: int, eta: int) -> list[tuple[str, dict]]:
+    rng = random.Random(count)
+    return [
+        (
+            str(i),
+            {
+                "id": str(i),
+                "lat": round(center.lat + rng.uniform(-0.02, 0.02), 6),
+                "lng": round(center.lng + rng.uniform(-0.02, 0.02), 6),
+                "eta": eta,
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def streamed(cache: BaseRedisCache, loc: Location, keys: set[str]) -> dict[str, dict]:
+    return dict(hit for hits, _ in cache.mget_stream(loc, keys) for hit in hits)
+
+
+def clear(cache: BaseRedisCache, loc: Location, keys: set[str]) -> None:
+    names = cache.cache_keys(loc)
+    names += [f"{name}:segments" for name in names]
+    names += [cache.patch_key(k) for k in keys] + [cache.marker_key()]
+    cache.db.delete(*names)
+
+
+def check(cache: BaseRedisCache, loc: Location) -> None:
+    written = vendors(loc, 200, eta=30)
+    keys = set(k for k, _ in written)
+    clear(cache, loc, keys)
+
+    # the kring caches merge into the cells of their last read
+    cache.mget(loc, keys)
+    cache.mset(loc, written)
+    assert cache.patch([(k, 1, {"eta": 5}) for k in keys]) == len(keys)
+    assert all(v["eta"] == 5 for v in streamed(cache, loc, keys).values())
+
+    # a full write from origin has every patch applied, the overlay must not
+    # bring back the older fields
+    cache.mget(loc, keys)
+    cache.mset(loc, vendors(loc, 200, eta=40))
+    assert all(v["eta"] == 40 for v in streamed(cache, loc, keys).values())
+    assert all(v["eta"] == 40 for _, v in cache.mget(loc, keys))
+
+    # replays stay dropped, newer patches apply again
+    assert cache.patch([(k, 1, {"eta": 5}) for k in keys]) == 0
+    assert cache.patch([(k, 2, {"eta": 7}) for k in keys]) == len(keys)
+    assert all(v["eta"] == 7 for v in streamed(cache, loc, keys).values())
+    clear(cache, loc, keys)
+    print(f"{cache}: a full write retires the overlays of its vendors")
+
+
+if __name__ == "__main__":
+    loc = Location(37.4855495, 127.013712)
+    check(KRingCache(), loc)
+    # above the writes, so nothing is compacted in the background
+    check(SegmentedKRingCache(compact_threshold=1 << 30), loc)
+    check(HashKRingCache(), loc)
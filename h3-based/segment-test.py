@@ -0,0 +1,59 @@
+import random
+
+from base import Location
+from kringcache import SegmentedKRingCache
+
+
+def vendors(center: Location, count: int, version: int) -> list[tuple[str, dict]]:
+    # within a few km, so every vendor falls into the ring around the center
+    rng = random.Random(count)
+    return [
+        (
+            str(i),
+            {
+                "id": str(i),
+                "lat": round(center.lat + rng.uniform(-0.02, 0.02), 6),
+                "lng": round(center.lng + rng.uniform(-0.02, 0.02), 6),
+                "version": version,
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def streamed(cache: SegmentedKRingCache, loc: Location, keys: set[str]):
+    hits, misses = [], set()
+    for chunk, remain in cache.mget_stream(loc, keys):
+        hits.extend(chunk)
+        misses |= remain
+    return dict(hits), misses
+
+
+def check(cache: SegmentedKRingCache, loc: Location, keys: set[str], version: int):
+    hits, misses = streamed(cache, loc, keys)
+    assert set(hits) | misses == keys and not set(hits) & misses
+    assert set(hits) == set(k for k, _ in cache.mget(loc, keys))
+    assert all(v["version"] == version for v in hits.values())
+    return hits
+
+
+if __name__ == "__main__":
+    loc = Location(37.4855495, 127.013712)
+    # above the writes below, so nothing is compacted in the background
+    cache = SegmentedKRingCache(compact_threshold=1 << 30)
+    for name in cache.cache_keys(loc):
+        cache.db.delete(name, cache.segment_key(name))
+
+    keys = set(str(i) for i in range(1500))
+    written = vendors(loc, 1000, version=1)
+    cache.mset(loc, written)
+    # a later segment overrides the values of the first
+    cache.mset(loc, [(k, v | {"version": 2}) for k, v in written])
+    hits = check(cache, loc, keys, version=2)
+    assert set(hits) == set(k for k, _ in written)
+
+    # folded into the base blobs, the reads must not change
+    for name in cache.cache_keys(loc):
+        cache.compact(name)
+    check(cache, loc, keys, version=2)
+    print(f"{cache}: mget_stream and mget agree on segments and base blobs")
@@ -0,0 +1,122 @@
+import h3
+import numpy as np
+from heapq import heappush, heappop
+from typing import Any
+
+from base import Location, distances
+
+
+# haversine on the mean radius is within 0.6% of the WGS84 geodesic everywhere
+GEODESIC_ERROR = 0.006
+
+
+class SpatialIndex:
+    # restaurants bucketed by h3 cell, stored contiguously per cell
+    def __init__(self, restaurants: dict[str, Any], resolution=7) -> None:
+        self.resolution = resolution
+
+        cells = {}
+        for k, v in restaurants.items():
+            cell = h3.geo_to_h3(v["lat"], v["lng"], resolution)
+            cells.setdefault(cell, []).append((k, v["lat"], v["lng"]))
+
+        keys, lats, lngs = [], [], []
+        self.ranges: dict[str, tuple[int, int]] = {}
+        for cell, items in cells.items():
+            self.ranges[cell] = (len(keys), len(keys) + len(items))
+            for k, lat, lng in items:
+                keys.append(k)
+                lats.append(lat)
+                lngs.append(lng)
+
+        self.keys = np.array(keys, dtype=object)
+        self.lats = np.array(lats, dtype=np.float64)
+        self.lngs = np.array(lngs, dtype=np.float64)
+        self.radius = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def cell_radius(self, cell: str) -> float:
+        # distance from the cell centre to its farthest vertex
+        radius = self.radius.get(cell)
+        if radius is None:
+            center = Location(*h3.h3_to_geo(cell))
+            boundary = np.array(h3.h3_to_geo_boundary(cell))
+            radius = float(distances(center, boundary[:, 0], boundary[:, 1]).max())
+            self.radius[cell] = radius
+        return radius
+
+    def covered_km(self, loc: Location, cell: str, k: int) -> float:
+        # anything outside the k-ring has to cross ring k + 1 first, so it is at
+        # least this far away
+        ring = list(h3.hex_ring(cell, k + 1))
+        centers = np.array([h3.h3_to_geo(c) for c in ring])
+        radius = np.array([self.cell_radius(c) for c in ring])
+        return float((distances(loc, centers[:, 0], centers[:, 1]) - radius).min())
+
+    def candidates(self, cells) -> np.ndarray:
+        ranges = [self.ranges[c] for c in cells if c in self.ranges]
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, end) for start, end in ranges])
+
+    def cutoff(self, dist: np.ndarray, limit: int, radius_km, error: float) -> float:
+        # restaurants farther than this (haversine) are surely not in the result
+        bound = np.inf
+        if radius_km is not None:
+            bound = radius_km / (1 - error)
+            dist = dist[: np.searchsorted(dist, radius_km / (1 + error), "right")]
+        if len(dist) >= limit:
+            bound = min(bound, dist[limit - 1] * (1 + error) / (1 - error))
+        return bound
+
+    def nearest(
+        self, loc: Location, limit=8000, radius_km=None, mode="geodesic"
+    ) -> set[str]:
+        # candidates are measured with one haversine pass. in geodesic mode only
+        # the restaurants close to the cut-off are measured again with the
+        # geodesic, the result is the same key set as a geodesic full scan
+        error = GEODESIC_ERROR if mode == "geodesic" else 0.0
+        ratio = (1 + error) / (1 - error)
+        cell = h3.geo_to_h3(loc.lat, loc.lng, self.resolution)
+
+        k = 0
+        while True:
+            idx = self.candidates(h3.k_ring(cell, k))
+            dist = distances(loc, self.lats[idx], self.lngs[idx])
+            order = np.argsort(dist)
+            dist, idx = dist[order], idx[order]
+
+            bound = self.cutoff(dist, limit, radius_km, error)
+            if len(idx) == len(self) or bound < self.covered_km(loc, cell, k):
+                break
+            k += 1
+
+        # certainly in when fewer than `limit` restaurants could be as close
+        could_be_closer = np.searchsorted(dist, dist * ratio, "right")
+        inside = int(np.searchsorted(could_be_closer, limit, "right"))
+        if radius_km is not None:
+            within = np.searchsorted(dist, radius_km / (1 + error), "right")
+            inside = min(inside, int(within))
+        end = int(np.searchsorted(dist, bound, "right"))
+
+        ret = set(self.keys[idx[:inside]].tolist())
+
+        edge = idx[inside:end]
+        if mode != "haversine":
+            dist = distances(loc, self.lats[edge], self.lngs[edge], mode)
+        else:
+            dist = dist[inside:end]
+
+        # the same heap as a full scan, so ties at the cut-off resolve the same
+        queue = []
+        need = limit - len(ret)
+        for d, k in zip(dist.tolist(), self.keys[edge].tolist()):
+            if radius_km is not None and d > radius_km:
+                continue
+            heappush(queue, (-d, k))
+            if len(queue) > need:
+                heappop(queue)
+        ret.update(k for _, k in queue)
+        return ret
@@ -0,0 +1,93 @@
+import functools
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable
+
+# seconds spent per phase by the request running in this context, None when
+# nothing is measured
+spans: ContextVar[Counter | None] = ContextVar("spans", default=None)
+
+PHASES = ("lookup", "deserialize", "origin", "serialize", "write", "total")
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def supported(p: float, count: int) -> bool:
+    # a percentile needs at least one sample above it, p99.9 takes 1000
+    return count >= round(1 / (1 - p))
+
+
+def timed(phase: str) -> Callable:
+    # adds the time of every call to `phase` of the running request
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            current = spans.get()
+            if current is None:
+                return fn(*args, **kwargs)
+            start_time = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                current[phase] += perf_counter() - start_time
+
+        return inner
+
+    return wrap
+
+
+class Histogram:
+    # log-linear buckets like HdrHistogram: values below 2**precision us get a
+    # bucket each, every power of two above is split into 2**(precision - 1)
+    # buckets, so a percentile is off by less than 2**(1 - precision)
+    def __init__(self, precision=7) -> None:
+        self.precision = precision
+        self.counts = Counter()
+        self.count = 0
+        self.max = 0.0
+
+    def index(self, us: int) -> int:
+        shift = max(0, us.bit_length() - self.precision)
+        return (shift << self.precision) + (us >> shift)
+
+    def value(self, index: int) -> float:
+        # middle of the bucket, in seconds
+        shift = index >> self.precision
+        low = (index & ((1 << self.precision) - 1)) << shift
+        return (low + ((1 << shift) - 1) / 2) / 1e6
+
+    def record(self, seconds: float) -> None:
+        self.counts[self.index(int(seconds * 1e6))] += 1
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        rank = p * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.value(index), self.max)
+        return self.max
+
+
+def report(name: str, histograms: dict[str, Histogram]) -> None:
+    columns = " ".join(f"{f'p{p * 100:g}':>9s}" for p in PERCENTILES)
+    print(f"{name:<22s} {'phase':<12s} {'count':>7s} {columns} {'max':>9s}")
+    for phase in PHASES:
+        h = histograms.get(phase)
+        # phases a backend doesn't have, like serializing in memory
+        if h is None or not h.max:
+            continue
+        values = " ".join(
+            f"{h.percentile(p) * 1000:>7.3f}ms"
+            if supported(p, h.count)
+            else f"{'-':>9s}"
+            for p in PERCENTILES
+        )
+        print(f"{'':<22s} {phase:<12s} {h.count:>7d} {values} {h.max * 1000:>7.3f}ms")
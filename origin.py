@@ -0,0 +1,85 @@
+from typing import Any
+
+
+async def fetch(ids: list[str]) -> list[tuple[str, Any]]:
+    return [
+        (
+            id,
+            {
+                "_id": id,
+                "vendor_id": id,
+                "day": "2024-01-08",
+                "vendor_nm": "[jy]맛있어요1호점",
+                "logo_exist_yn": True,
+                "thumbnail_exist_yn": False,
+                "new_tag_mark_start_date": "2023-05-31T00:00:00Z",
+                "vendor_new_for_uprank_yn": False,
+                "vendor_new_yn": False,
+                "franchise_id": 80,
+                "vendor_type_cd": "food",
+                "yostore_target_yn": False,
+                "review_cnt": 2,
+                "review_avg_cnt": 5,
+                "vendor_contract_yn": True,
+                "current_extra_discount_yn": False,
+                "extra_discount_amt": 3000,
+                "discount_rate": 0,
+                "payment_method_code_list": ["creditcard", "online"],
+                "vendor_open_yn": True,
+                "vendor_oe_yn": False,
+                "vendor_online_yn": True,
+                "pickup_available_time": 1,
+                "test_vendor_yn": False,
+                "category_list": ["중식", "한식", "테이크아웃", "카페디저트"],
+                "one_dish_threshold": 9000,
+                "display_enable_yn": True,
+                "delivery_discount_yn": True,
+                "pickup_discount_yn": False,
+                "preorder_discount_yn": False,
+                "vendor_open_for_swimlane_yn": True,
+                "hygienic_yn": False,
+                "company_no": "3330133333",
+                "partner_tenant_cd_list": [],
+                "hygiene_grade_cd": None,
+                "rank_keyword": None,
+                "delivery_order_cnt": 0,
+                "takeout_order_cnt": 0,
+                "delivery_coupon_yn": False,
+                "pickup_coupon_yn": False,
+                "delivery_max_coupon_price": 0,
+                "pickup_max_coupon_price": 0,
+                "created_at": "2024-01-08T11:38:11.409Z",
+                "modified_at": "2024-01-08T11:38:11.409Z",
+                "vd_recent_eta": -1,
+                "vd_recent_eta_expires_at": "2024-01-16T05:30:24.038Z",
+            },
+        )
+        for id in ids
+    ]
+
+
+async def fetch_small(ids: list[str]) -> list[tuple[str, Any]]:
+    return [
+        (
+            id,
+            {
+                "_id": id,
+                "vendor_id": id,
+                "day": "2024-01-08",
+                "vendor_nm": "[jy]맛있어요1호점",
+                "logo_exist_yn": True,
+                "thumbnail_exist_yn": False,
+                "new_tag_mark_start_date": "2023-05-31T00:00:00Z",
+                "vendor_new_for_uprank_yn": False,
+                "vendor_new_yn": False,
+                "franchise_id": 80,
+                "vendor_type_cd": "food",
+                "yostore_target_yn": False,
+                "review_cnt": 2,
+                "review_avg_cnt": 5,
+                "vendor_contract_yn": True,
+                "current_extra_discount_yn": False,
+            },
+        )
+        for id in ids
+    ]
@@ -0,0 +1,67 @@
+import asyncio
+import random
+from time import perf_counter
+
+from backends import CompressionSerializer
+from origin import fetch
+from patch import PatchCache, PatchLMDBCache, PatchRedisCache
+from vendor import FAST_FIELDS
+
+COUNT = 8000
+
+
+def changes(values: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+    fields = sorted(FAST_FIELDS)
+    return [
+        (
+            k,
+            {f: v[f] for f in random.sample(fields, 3) if f in v}
+            | {"vd_recent_eta": random.randint(10, 60)},
+        )
+        for k, v in values
+    ]
+
+
+async def measure(cache_class: type[PatchCache]) -> None:
+    cache_class.prepare()
+    cache = cache_class()
+    pairs = await fetch([str(i) for i in range(COUNT)])
+    await cache.mset(pairs, ttl=60)
+    updates = changes(pairs)
+
+    # today: every change rewrites the whole vendor
+    serializer = CompressionSerializer()
+    full = [(k, v | fields) for (k, v), (_, fields) in zip(pairs, updates)]
+    start_time = perf_counter()
+    await cache.mset(full, ttl=60)
+    full_time = perf_counter() - start_time
+    full_size = sum(len(serializer.dumps(v)) for _, v in full)
+
+    patches = [(k, 1, fields) for k, fields in updates]
+    start_time = perf_counter()
+    applied = await cache.patch(patches, ttl=60)
+    patch_time = perf_counter() - start_time
+    patch_size = sum(len(serializer.dumps((1, f))) for _, _, f in patches)
+
+    # replayed and older patches are dropped
+    stale = await cache.patch(
+        patches[:100] + [(k, 0, f) for k, _, f in patches[:100]], ttl=60
+    )
+
+    values = dict(await cache.mget([k for k, _ in updates[:100]]))
+    assert all(values[k] | f == values[k] for k, f in updates[:100])
+
+    # a full write retires the overlays, and replays of older patches stay out
+    await cache.mset(pairs[:100], ttl=60)
+    assert dict(await cache.mget([k for k, _ in pairs[:100]])) == dict(pairs[:100])
+    assert await cache.patch(patches[:100], ttl=60) == 0
+    print(
+        f"{cache_class.__name__:<16s}: full write: {full_time * 1000:.3f}ms {full_size / COUNT:.0f} bytes/vendor, "
+        f"patch: {patch_time * 1000:.3f}ms {patch_size / COUNT:.0f} bytes/vendor, applied: {applied}, stale applied: {stale}"
+    )
+    cache.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(measure(PatchRedisCache))
+    asyncio.run(measure(PatchLMDBCache))
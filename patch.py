@@ -0,0 +1,121 @@
+from collections import Counter
+from typing import Any
+
+import msgspec
+
+from backends import CacheBackend, LMDBCache, RedisCacheTest
+
+# (vendor id, version, changed fields)
+Patch = tuple[str, int, dict[str, Any]]
+
+
+def merge(value: Any, fields: dict[str, Any]) -> Any:
+    if isinstance(value, dict):
+        return value | fields
+    return msgspec.structs.replace(value, **fields)
+
+
+class PatchCache(CacheBackend):
+    # fast changing fields live in a small overlay record next to the vendor,
+    # `"<k>:patch"` holding (version, fields), merged over the vendor on read.
+    # a patch writes only its fields, and one with a version not above the
+    # overlay's is dropped. vendors are stored as (version, value), a full
+    # write takes the overlay's version and so retires it, reads skip an
+    # overlay that is not newer than its vendor
+    store: type[CacheBackend]
+
+    # overlays live at least this long, and at least as long as their vendor
+    patch_ttl = 300
+
+    def __init__(self, read_only=False) -> None:
+        self.db = self.store(read_only=read_only)
+        self.counters = Counter()
+
+    @classmethod
+    def prepare(cls) -> None:
+        cls.store.prepare()
+
+    @classmethod
+    def lmdb_readers(cls, workers: int) -> int:
+        return cls.store.lmdb_readers(workers)
+
+    def overlay_ttl(self, ttl: int | None) -> int:
+        # the overlay keeps the version after a full write, it must not expire
+        # before the vendor does
+        return max(ttl or 0, self.patch_ttl)
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        names = keys + [f"{k}:patch" for k in keys]
+        found = dict(await self.db.mget(names))
+
+        ret = []
+        for key in keys:
+            base = found.get(key)
+            if base is None:
+                continue
+            version, value = base
+            overlay = found.get(f"{key}:patch")
+            if overlay is not None and overlay[0] > version:
+                value = merge(value, overlay[1])
+                self.counters["overlaid"] += 1
+            ret.append((key, value))
+        return ret
+
+    async def mset(
+        self, pairs: list[tuple[str, Any]], ttl: int | None = None, version=0
+    ) -> None:
+        # a full write already has every patch applied so far. the vendor takes
+        # the version of its overlay, the overlay is emptied at that version so
+        # older patches are still dropped while the vendor lives
+        if not pairs:
+            return
+        names = [f"{k}:patch" for k, _ in pairs]
+        overlays = dict(await self.db.mget(names))
+
+        bases, records = [], []
+        for (key, value), name in zip(pairs, names):
+            current = max(version, overlays[name][0] if name in overlays else 0)
+            bases.append((key, (current, value)))
+            if name in overlays:
+                records.append((name, (current, {})))
+
+        await self.db.mset(bases, ttl=ttl)
+        if records:
+            await self.db.mset(records, ttl=self.overlay_ttl(ttl))
+
+    async def patch(self, patches: list[Patch], ttl: int | None = None) -> int:
+        # read-modify-write of the overlays, patches of one vendor are
+        # expected from a single producer in version order. `ttl` is the one
+        # the vendors were written with
+        names = [f"{k}:patch" for k, _, _ in patches]
+        overlays = dict(await self.db.mget(names))
+
+        records = {}
+        applied = 0
+        for name, (_, version, fields) in zip(names, patches):
+            current = records.get(name) or overlays.get(name)
+            if current is not None and version <= current[0]:
+                self.counters["stale_patch"] += 1
+                continue
+            # fields of older patches stay until a newer one changes them
+            records[name] = (version, (current[1] if current else {}) | fields)
+            applied += 1
+
+        if records:
+            await self.db.mset(list(records.items()), ttl=self.overlay_ttl(ttl))
+        self.counters["patched"] += applied
+        return applied
+
+    def stats(self) -> dict[str, float]:
+        return dict(self.counters)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class PatchRedisCache(PatchCache):
+    store = RedisCacheTest
+
+
+class PatchLMDBCache(PatchCache):
+    store = LMDBCache
@@ -0,0 +1,73 @@
+from typing import Any, Collection
+
+import msgspec
+
+from backends import CacheBackend, LMDBCache, RedisCacheTest, project
+from vendor import HOT_FIELDS
+
+
+class SplitCache(CacheBackend):
+    # every vendor is stored as two records in `store`, the hot fields and the
+    # rest. a read that only needs hot fields neither transfers nor decodes the
+    # cold record, a full read gets both in one mget
+    store: type[CacheBackend]
+    hot = HOT_FIELDS
+
+    def __init__(self, read_only=False) -> None:
+        self.db = self.store(read_only=read_only)
+
+    @classmethod
+    def prepare(cls) -> None:
+        cls.store.prepare()
+
+    @classmethod
+    def lmdb_readers(cls, workers: int) -> int:
+        return cls.store.lmdb_readers(workers)
+
+    def split(self, value: Any) -> tuple[dict[str, Any], dict[str, Any]]:
+        if not isinstance(value, dict):
+            value = msgspec.to_builtins(value)
+        hot = {k: v for k, v in value.items() if k in self.hot}
+        cold = {k: v for k, v in value.items() if k not in self.hot}
+        return hot, cold
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        names = [f"{k}:hot" for k in keys] + [f"{k}:cold" for k in keys]
+        found = dict(await self.db.mget(names))
+
+        ret = []
+        for key in keys:
+            hot = found.get(f"{key}:hot")
+            cold = found.get(f"{key}:cold")
+            # the records are written together but may expire apart
+            if hot is not None and cold is not None:
+                ret.append((key, hot | cold))
+        return ret
+
+    async def mget_fields(
+        self, keys: list[str], fields: Collection[str]
+    ) -> list[tuple[str, dict[str, Any]]]:
+        if not self.hot.issuperset(fields):
+            return await super().mget_fields(keys, fields)
+
+        found = await self.db.mget([f"{k}:hot" for k in keys])
+        return [(k.removesuffix(":hot"), project(v, fields)) for k, v in found]
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        records = []
+        for key, value in pairs:
+            hot, cold = self.split(value)
+            records.append((f"{key}:hot", hot))
+            records.append((f"{key}:cold", cold))
+        await self.db.mset(records, ttl=ttl)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SplitRedisCache(SplitCache):
+    store = RedisCacheTest
+
+
+class SplitLMDBCache(SplitCache):
+    store = LMDBCache
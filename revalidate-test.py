@@ -0,0 +1,54 @@
+import asyncio
+from time import perf_counter
+
+from backends import CacheBackend, MemoryCache
+from origin import fetch
+from revalidate import RevalidatingMemoryCache
+
+TTL = 1
+DURATION = 5
+INTERVAL = 0.02
+ORIGIN_LATENCY = 0.05
+
+HOT_KEYS = [str(i) for i in range(200)]
+
+
+async def slow_fetch(ids: list[str]):
+    await asyncio.sleep(ORIGIN_LATENCY)
+    return await fetch(ids)
+
+
+async def measure(name: str, cache: CacheBackend) -> None:
+    # the same hot vendors every 20ms, the plain cache expires them all at once
+    await cache.mset(await fetch(HOT_KEYS), ttl=TTL)
+
+    latencies, waited = [], 0
+    start = perf_counter()
+    while perf_counter() - start < DURATION:
+        start_time = perf_counter()
+        values = await cache.mget(HOT_KEYS)
+        hit = set(k for k, _ in values)
+        remain = [k for k in HOT_KEYS if k not in hit]
+        if remain:
+            waited += 1
+            await cache.mset(await slow_fetch(remain), ttl=TTL)
+        latencies.append(perf_counter() - start_time)
+        await asyncio.sleep(INTERVAL)
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(
+        f"{name:<12s}: requests: {len(latencies)}, waited on origin: {waited}, "
+        f"p50: {latencies[len(latencies) // 2] * 1000:.3f}ms, p99: {p99 * 1000:.3f}ms, max: {latencies[-1] * 1000:.3f}ms, "
+        f"{cache.stats()}"
+    )
+    cache.close()
+
+
+async def main() -> None:
+    await measure("memory", MemoryCache())
+    await measure("memory-swr", RevalidatingMemoryCache(origin=slow_fetch))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
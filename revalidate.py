@@ -0,0 +1,129 @@
+import asyncio
+import math
+import random
+from collections import Counter, defaultdict
+from time import perf_counter
+from typing import Any
+
+from backends import CacheBackend, LMDBCache, MemoryCache, RedisCacheTest, now_ms
+from origin import fetch
+from singleflight import Origin, SingleFlight
+
+
+class RevalidatingCache(CacheBackend):
+    # entries are stored as (soft expiry, ttl, value) and kept by `store` until
+    # the hard expiry, `grace` times the ttl. between the two a read still
+    # returns the value and queues the key for a background refresh, the keys
+    # queued in one loop iteration go to the origin as one batch. a key read
+    # near its soft expiry is refreshed ahead of it with a probability growing
+    # towards it (XFetch), so hot keys rarely go stale at all
+    store: type[CacheBackend]
+
+    # refreshes outlive the request that started them
+    long_lived = True
+
+    grace = 2.0
+
+    # above 1 refreshes earlier
+    beta = 1.0
+
+    # ms a refresh is expected to take until one has been measured. with 0
+    # nothing would be refreshed ahead before the first key went stale
+    origin_ms = 50.0
+
+    def __init__(self, read_only=False, origin: Origin = fetch) -> None:
+        self.db = self.store(read_only=read_only)
+        self.flight = SingleFlight(origin)
+        self.refreshing: set[str] = set()
+        self.tasks: set[asyncio.Task] = set()
+        # running average of a refresh in ms, how far ahead to start one
+        self.delta = self.origin_ms
+        self.counters = Counter()
+
+    @classmethod
+    def prepare(cls) -> None:
+        cls.store.prepare()
+
+    @classmethod
+    def lmdb_readers(cls, workers: int) -> int:
+        return cls.store.lmdb_readers(workers)
+
+    def due(self, soft: int, now: int) -> str | None:
+        if not soft:
+            return None
+        if soft <= now:
+            return "stale"
+        if now - self.delta * self.beta * math.log(1 - random.random()) >= soft:
+            return "ahead"
+        return None
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        now = now_ms()
+        ret, due = [], []
+        for key, (soft, ttl, value) in await self.db.mget(keys):
+            reason = self.due(soft, now)
+            if reason == "stale":
+                self.counters["stale"] += 1
+            if reason is not None:
+                due.append((key, ttl, reason))
+            ret.append((key, value))
+
+        if due:
+            self.refresh(due)
+        return ret
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        soft = now_ms() + int(ttl * 1000) if ttl else 0
+        hard = math.ceil(ttl * self.grace) if ttl else None
+        await self.db.mset([(k, (soft, ttl, v)) for k, v in pairs], ttl=hard)
+
+    def refresh(self, due: list[tuple[str, int, str]]) -> None:
+        # a key already being refreshed is not queued again
+        by_ttl = defaultdict(list)
+        for key, ttl, reason in due:
+            if key not in self.refreshing:
+                self.refreshing.add(key)
+                self.counters[f"{reason}_refresh"] += 1
+                by_ttl[ttl].append(key)
+
+        for ttl, keys in by_ttl.items():
+            task = asyncio.create_task(self.revalidate(keys, ttl))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def revalidate(self, keys: list[str], ttl: int) -> None:
+        start_time = perf_counter()
+        try:
+            _, fresh = await self.flight.fetch(keys)
+            await self.mset(fresh, ttl=ttl)
+            self.counters["refreshed"] += len(fresh)
+        except Exception:
+            # the stale value stays until the hard expiry, the next read retries
+            self.counters["refresh_failed"] += len(keys)
+            return
+        finally:
+            self.refreshing.difference_update(keys)
+
+        elapsed = (perf_counter() - start_time) * 1000
+        self.delta = 0.8 * self.delta + 0.2 * elapsed
+
+    def stats(self) -> dict[str, float]:
+        return dict(self.counters)
+
+    def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        self.db.close()
+
+
+class RevalidatingMemoryCache(RevalidatingCache):
+    store = MemoryCache
+    process_local = MemoryCache.process_local
+
+
+class RevalidatingRedisCache(RevalidatingCache):
+    store = RedisCacheTest
+
+
+class RevalidatingLMDBCache(RevalidatingCache):
+    store = LMDBCache
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+from collections import Counter
+from time import perf_counter
+
+from latency import Histogram, spans
+from origin import fetch
+from sharded import ShardedLMDBCache
+
+BATCH = 500
+
+
+def writer(
+    args: tuple[int, int, int, multiprocessing.Barrier]
+) -> tuple[float, Histogram]:
+    # one pool worker writing back the misses of its requests in batches
+    shards, idx, count, barrier = args
+    cache = ShardedLMDBCache(shards=shards)
+    pairs = asyncio.run(fetch([f"{idx}-{i}" for i in range(count)]))
+
+    async def write() -> tuple[float, Histogram]:
+        # a batch without its encoding is the wait for and the hold of the
+        # writer locks of its shards
+        commits = Histogram()
+        barrier.wait()
+        start_time = perf_counter()
+        for i in range(0, len(pairs), BATCH):
+            current = Counter()
+            spans.set(current)
+            batch_time = perf_counter()
+            await cache.mset(pairs[i : i + BATCH], ttl=60)
+            commits.record(perf_counter() - batch_time - current["serialize"])
+        return perf_counter() - start_time, commits
+
+    try:
+        return asyncio.run(write())
+    finally:
+        cache.close()
+
+
+def measure(shards: int, writers: int, count: int) -> None:
+    ShardedLMDBCache.prepare()
+    # every writer opens its environments itself, spawn copies no handles
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        barrier = manager.Barrier(writers)
+        with context.Pool(writers) as pool:
+            args = [(shards, i, count, barrier) for i in range(writers)]
+            results = pool.map(writer, args)
+
+    elapsed = max(t for t, _ in results)
+    commits = Histogram()
+    for _, histogram in results:
+        commits.merge(histogram)
+    print(
+        f"shards: {shards:>2d}, writers: {writers}, {writers * count / elapsed:>9.0f} items/s, {elapsed:.3f}s, "
+        f"commit p50: {commits.percentile(0.5) * 1000:.2f}ms p99: {commits.percentile(0.99) * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--shards", type=int, nargs="*", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    # writes are encoding bound, more shards only add throughput with a core
+    # per writer, with fewer the commit times show the lock waits saved
+    print(f"cpus: {os.cpu_count()}")
+    for shards in args.shards:
+        measure(shards, args.writers, args.count)
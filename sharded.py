@@ -0,0 +1,116 @@
+import asyncio
+import os
+import shutil
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from operator import itemgetter
+from typing import Any, Callable
+
+from backends import ExpiringCache, LMDBCache, LMDBMsgpackCache
+from latency import timed
+
+
+@timed("reader")
+def read(env: LMDBCache, keys: list[str]) -> list[tuple[str, Any]]:
+    # the busy time of the shard threads, bench splits the read in its ratio
+    return env.get(keys)
+
+
+class ShardedLMDBCache(ExpiringCache):
+    # keys are spread over `shards` environments by crc32. LMDB allows one
+    # writer per environment, so workers writing back misses to different
+    # shards don't wait for each other's commit. a batch fans out to one
+    # thread per shard, py-lmdb drops the GIL inside its transactions.
+    # every process has to open the same shard count
+    path = "./lmdb-shards"
+    shards = 4
+    shard_class: type[LMDBCache] = LMDBCache
+
+    long_lived = True
+
+    def __init__(self, read_only=False, shards: int | None = None) -> None:
+        self.read_only = read_only
+        self.shards = shards or self.shards
+        # lmdb creates the directory of an environment but not its parent
+        os.makedirs(self.path, exist_ok=True)
+        self.envs = [
+            self.shard_class(read_only=read_only, path=f"{self.path}/{i}")
+            for i in range(self.shards)
+        ]
+        self.pool = ThreadPoolExecutor(self.shards, thread_name_prefix="shard")
+
+    @classmethod
+    def prepare(cls) -> None:
+        shutil.rmtree(cls.path, ignore_errors=True)
+
+    @classmethod
+    def lmdb_readers(cls, workers: int) -> int:
+        # every thread of the shard pool may read any shard, a shard holds the
+        # readers of its class plus the sweeper's
+        return workers * cls.shards * (cls.shard_class.readers + 1)
+
+    def shard(self, key: str) -> int:
+        # stable across processes, unlike hash()
+        return zlib.crc32(key.encode()) % self.shards
+
+    def split(self, items: list, key: Callable = lambda k: k) -> dict[int, list]:
+        groups = defaultdict(list)
+        for item in items:
+            groups[self.shard(key(item))].append(item)
+        return groups
+
+    async def fan_out(self, fn: Callable, groups: dict[int, list]) -> list[Any]:
+        # a batch on a single shard goes through the pool too, so the loop
+        # never blocks on a transaction whatever the batch spans
+        loop = asyncio.get_running_loop()
+        # a context copy per shard, so the latency spans of the request follow
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.pool, copy_context().run, fn, self.envs[i], group
+                )
+                for i, group in groups.items()
+            )
+        )
+
+    async def run_write(self, fn, *args) -> Any:
+        # the sweeper's transactions stay off the loop like the writes
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, copy_context().run, fn, *args)
+
+    def get(self, keys: list[str]) -> list[tuple[str, Any]]:
+        groups = self.split(keys)
+        return [item for i, group in groups.items() for item in self.envs[i].get(group)]
+
+    def put(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        for i, group in self.split(pairs, itemgetter(0)).items():
+            self.envs[i].put(group, ttl)
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        if not keys:
+            return []
+        results = await self.fan_out(read, self.split(keys))
+        return [item for result in results for item in result]
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        if self.read_only or not pairs:
+            return
+        groups = self.split(pairs, itemgetter(0))
+        await self.fan_out(lambda env, group: env.put(group, ttl), groups)
+
+    def sweep_expired(self, now: int, limit: int) -> int:
+        # up to `limit` per shard, sweep() goes on while any shard fills it
+        return max(env.sweep_expired(now, limit) for env in self.envs)
+
+    def close(self) -> None:
+        super().close()
+        self.pool.shutdown()
+        for env in self.envs:
+            env.close()
+
+
+class ShardedLMDBMsgpackCache(ShardedLMDBCache):
+    path = "./lmdb-shards-msgpack"
+    shard_class = LMDBMsgpackCache
@@ -0,0 +1,191 @@
+import fcntl
+import hashlib
+import os
+import struct
+from collections import Counter
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+from backends import CacheBackend, CompressionSerializer, expired, expires_at, now_ms
+
+
+# segment header: magic, bucket count, bucket size
+HEADER = struct.Struct("<4sII")
+MAGIC = b"VSHM"
+
+# bucket header: seqlock counter, state, key hash, expiry ms, key length, value length
+BUCKET = struct.Struct("<IIQQHI")
+KEY_SIZE = 32
+
+EMPTY, USED = 0, 1
+# a bucket whose seqlock stayed odd, its writer died halfway
+STUCK = 2
+
+# linear probing gives up after this many buckets, the entry is not cached
+MAX_PROBE = 64
+
+# copies of a bucket a reader tries before it takes the bucket as stuck
+MAX_RETRIES = 10000
+
+
+def key_hash(key: bytes) -> int:
+    # python's hash() is salted per process, this one is the same in every worker
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def lock_path(name: str) -> str:
+    return f"/tmp/{name}.lock"
+
+
+class SharedMemoryCache(CacheBackend):
+    # open addressing table of fixed size buckets in one shared memory segment.
+    # readers never lock, they retry a bucket whose seqlock moved while they
+    # copied it. writers serialize on a flock so any worker can write
+    name = "vendor-cache"
+
+    # the instance creating the segment sizes it for `capacity` entries, with
+    # the buckets at most three quarters full. the others attach to it as is
+    def __init__(self, read_only=False, capacity=1 << 18, bucket_size=1024) -> None:
+        self.serializer = CompressionSerializer()
+        self.counters = Counter()
+        buckets = 1 << (capacity * 4 // 3 - 1).bit_length()
+        try:
+            self.shm = SharedMemory(name=self.name)
+            # attaching registers the segment too, and the tracker would unlink
+            # it when this worker exits
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except FileNotFoundError:
+            self.shm = SharedMemory(
+                name=self.name, create=True, size=HEADER.size + buckets * bucket_size
+            )
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+            HEADER.pack_into(self.shm.buf, 0, MAGIC, buckets, bucket_size)
+
+        magic, self.buckets, self.bucket_size = HEADER.unpack_from(self.shm.buf, 0)
+        assert magic == MAGIC, f"{self.name} is not a cache segment"
+        self.value_size = self.bucket_size - BUCKET.size - KEY_SIZE
+
+        self.lock = os.open(lock_path(self.name), os.O_RDWR | os.O_CREAT, 0o666)
+
+    @classmethod
+    def prepare(cls) -> None:
+        try:
+            shm = SharedMemory(name=cls.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+    @classmethod
+    def cleanup(cls) -> None:
+        # every process unregistered the segment, so nothing else unlinks it
+        cls.prepare()
+        try:
+            os.remove(lock_path(cls.name))
+        except FileNotFoundError:
+            pass
+
+    def offset(self, bucket: int) -> int:
+        return HEADER.size + bucket * self.bucket_size
+
+    def read(self, bucket: int, h: int) -> tuple[int, int, bytes | None, bytes]:
+        # (state, expiry, key, value), key and value are only copied out when
+        # the hash matches. a stuck bucket holds no key, lookups probe past it
+        buf = self.shm.buf
+        off = self.offset(bucket)
+        for _ in range(MAX_RETRIES):
+            seq, state, bh, expires, key_len, value_len = BUCKET.unpack_from(buf, off)
+            if seq & 1:
+                continue
+            if state == EMPTY or bh != h:
+                key, value = None, b""
+            else:
+                start = off + BUCKET.size
+                key = bytes(buf[start : start + key_len])
+                start += KEY_SIZE
+                value = bytes(buf[start : start + value_len])
+            if BUCKET.unpack_from(buf, off)[0] == seq:
+                return state, expires, key, value
+        self.counters["stuck"] += 1
+        return STUCK, 0, None, b""
+
+    def find(self, key: bytes, h: int) -> bytes | None:
+        now = now_ms()
+        for i in range(MAX_PROBE):
+            state, expires, bkey, value = self.read((h + i) % self.buckets, h)
+            if state == EMPTY:
+                break
+            if bkey == key and not expired(expires, now):
+                return value
+        return None
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        ret = []
+        for key in keys:
+            k = key.encode()
+            value = self.find(k, key_hash(k))
+            if value is not None:
+                ret.append((key, self.serializer.loads(value)))
+        return ret
+
+    def write(
+        self, bucket: int, h: int, expires: int, key: bytes, value: bytes
+    ) -> None:
+        buf = self.shm.buf
+        off = self.offset(bucket)
+        # even again if a writer died halfway through this bucket
+        seq = BUCKET.unpack_from(buf, off)[0] & ~1
+
+        # odd while the bucket is being rewritten, bumped back to even last
+        struct.pack_into("<I", buf, off, seq + 1)
+        BUCKET.pack_into(buf, off, seq + 1, USED, h, expires, len(key), len(value))
+        start = off + BUCKET.size
+        buf[start : start + len(key)] = key
+        start += KEY_SIZE
+        buf[start : start + len(value)] = value
+        struct.pack_into("<I", buf, off, seq + 2)
+
+    def slot(self, key: bytes, h: int, now: int) -> int:
+        # the bucket already holding the key, else the first free or expired one
+        free = -1
+        for i in range(MAX_PROBE):
+            bucket = (h + i) % self.buckets
+            state, expires, bkey, _ = self.read(bucket, h)
+            if bkey == key:
+                return bucket
+            if free < 0 and (state != USED or expired(expires, now)):
+                free = bucket
+            if state == EMPTY:
+                break
+        return free
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        if not pairs:
+            return
+
+        expires = expires_at(ttl)
+        encoded = [(k.encode(), self.serializer.dumps(v)) for k, v in pairs]
+
+        fcntl.flock(self.lock, fcntl.LOCK_EX)
+        try:
+            now = now_ms()
+            for key, value in encoded:
+                if len(key) > KEY_SIZE or len(value) > self.value_size:
+                    self.counters["rejected"] += 1
+                    continue
+                h = key_hash(key)
+                bucket = self.slot(key, h, now)
+                if bucket >= 0:
+                    self.write(bucket, h, expires, key, value)
+                else:
+                    self.counters["full"] += 1
+        finally:
+            fcntl.flock(self.lock, fcntl.LOCK_UN)
+
+    def stats(self) -> dict[str, float]:
+        return dict(self.counters)
+
+    def close(self) -> None:
+        os.close(self.lock)
+        self.shm.close()
@@ -0,0 +1,101 @@
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable
+
+Origin = Callable[[list[str]], Awaitable[list[tuple[str, Any]]]]
+
+# resolved value of an id the origin did not return
+MISSING = object()
+
+
+class SingleFlight:
+    # concurrent misses on the same vendor id wait on one in-flight future, and
+    # every id queued before the flush goes to the origin in one batch
+    def __init__(self, origin: Origin, window=0.0) -> None:
+        self.origin = origin
+        self.window = window
+
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.queued: list[str] = []
+        self.flusher: asyncio.Task | None = None
+        # futures of callers cancelled while waiting, their values are written
+        # back by the first waiter on the same id instead
+        self.orphaned: weakref.WeakSet[asyncio.Future] = weakref.WeakSet()
+
+    async def fetch(
+        self, ids: list[str]
+    ) -> tuple[list[tuple[str, Any]], list[tuple[str, Any]]]:
+        # returns (items, fresh). fresh are the items this call was first to
+        # ask for, only those need to be written back to the cache
+        loop = asyncio.get_running_loop()
+
+        futures = {}
+        owned = set()
+        for id in dict.fromkeys(ids):
+            future = self.inflight.get(id)
+            if future is None:
+                future = self.inflight[id] = loop.create_future()
+                self.queued.append(id)
+                owned.add(id)
+            futures[id] = future
+
+        if self.queued and self.flusher is None:
+            self.flusher = asyncio.create_task(self.flush())
+            self.flusher.add_done_callback(self.abandoned)
+
+        # shielded, a cancelled caller must not cancel the futures other
+        # requests wait on too
+        try:
+            values = await asyncio.gather(*map(asyncio.shield, futures.values()))
+        except asyncio.CancelledError:
+            # the fetch goes on without this caller
+            self.orphaned.update(futures[id] for id in owned)
+            raise
+
+        for id, future in futures.items():
+            if future in self.orphaned:
+                self.orphaned.discard(future)
+                owned.add(id)
+
+        items = [(k, v) for k, v in zip(futures, values) if v is not MISSING]
+        fresh = [(k, v) for k, v in items if k in owned]
+        return items, fresh
+
+    async def flush(self) -> None:
+        # wait for the other requests of this loop iteration (or window) to queue
+        await asyncio.sleep(self.window)
+        ids, self.queued, self.flusher = self.queued, [], None
+
+        try:
+            found = dict(await self.origin(ids))
+        except BaseException as e:
+            self.settle(ids, error=e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        self.settle(ids, found)
+
+    def abandoned(self, task: asyncio.Task) -> None:
+        # cancelled before it took the queue, nothing else would settle it
+        if task is self.flusher:
+            ids, self.queued, self.flusher = self.queued, [], None
+            self.settle(ids, error=asyncio.CancelledError())
+
+    def settle(
+        self,
+        ids: list[str],
+        found: dict[str, Any] | None = None,
+        error: BaseException | None = None,
+    ) -> None:
+        # every id of the batch leaves inflight, whatever happened to the flush
+        for id in ids:
+            future = self.inflight.pop(id)
+            if future.done():
+                continue
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(found.get(id, MISSING))
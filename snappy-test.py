@@ -2,61 +2,9 @@ import pickle
 import snappy
 import zlib
 import orjson as json
-import msgspec
 from time import perf_counter
 
-
-class Restaurant(msgspec.Struct):
-    id: int
-
-    distance: float = 0.0
-    min_delivery_fee: int = 0
-    max_delivery_fee: int = 0
-    estimated_delivery_time: int = 0
-    order_count: int = 0
-    review_count: int = 0
-    review_avg: float = 0.0
-
-    is_ypx: bool = False
-    previously_ordered: bool = False
-    mov: int = 0
-    is_hygienic: bool = False
-    hygiene_grade: int = -1  # good=0, great=1, excellent=2
-    min_pickup_time: int = 999
-
-    # channelyo filter
-    franchise_id: int | None = None
-    partner_tenant_ids: list[str] = []
-    is_yostore: bool = False
-    is_test: bool = False
-    payment_methods: list[str] | None = []
-
-    # feature
-    categories: list[str] = []
-    score: float = 0.0
-    rank_keyword: str | None = None
-    taste_list: list[str] = []
-    taste_ratios: list[float] = []
-    label: dict[str, float] = {}
-    search_count: int = 0
-    discount_percent: float = 0.0
-    has_discount: bool = False  # additional_discount 까지 고려된 값
-    max_coupon_price: float = 0.0
-    extra_discount_amt: float = 0.0
-    aov: int = 0
-    cc_categories: list[str] = []
-    cc_scores: list[float] = []
-
-    # metadata
-    open: bool = False
-    open_for_swimlane: bool = False
-    is_displayable: bool = False
-    new: bool = False
-    company_number: str | None = None
-    has_thumbnail: bool = False
-
-    vd_recent_eta: int = -1
-    vd_aggregated_eta: int = -1
+from restaurant import Restaurant
 
 
 def fetch(id):
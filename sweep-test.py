@@ -0,0 +1,33 @@
+import asyncio
+
+from backends import LMDBCache, LMDBMsgpackCache
+from origin import fetch
+
+
+def counts(cache: LMDBCache) -> tuple[int, int]:
+    # entries in the data and the expiry index
+    with cache.db.begin() as txn:
+        return txn.stat(cache.data)["entries"], txn.stat(cache.expiry)["entries"]
+
+
+async def check(cache_class: type[LMDBCache]) -> None:
+    cache_class.prepare()
+    cache = cache_class()
+    await cache.mset(await fetch([f"short-{i}" for i in range(1000)]), ttl=1)
+    await cache.mset(await fetch([f"long-{i}" for i in range(500)]), ttl=60)
+    assert counts(cache) == (1500, 1500), counts(cache)
+
+    # the sweeper the benchmark starts for its writers
+    cache.start_sweeper(interval=0.1)
+    await asyncio.sleep(1.5)
+
+    assert counts(cache) == (500, 500), counts(cache)
+    assert len(await cache.mget([f"long-{i}" for i in range(500)])) == 500
+    cache.close()
+    assert cache.sweeper is None
+    print(f"{cache_class.__name__}: expired entries swept from data and expiry")
+
+
+if __name__ == "__main__":
+    asyncio.run(check(LMDBCache))
+    asyncio.run(check(LMDBMsgpackCache))
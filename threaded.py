@@ -0,0 +1,83 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, AsyncIterator
+
+from backends import BoltDBCache, ExpiringCache, LMDBMsgpackCache
+from latency import timed
+
+
+class ThreadedCache(ExpiringCache):
+    # keeps the blocking transactions of a file store off the event loop. reads
+    # are split into chunks that run on a reader pool in parallel, LMDB drops
+    # the GIL while it looks keys up. writes and sweeps go through one writer
+    # thread, the stores allow a single writer anyway
+    readers = 4
+
+    def __init__(self, read_only=False) -> None:
+        super().__init__(read_only)
+        self.reader = ThreadPoolExecutor(self.readers, thread_name_prefix="reader")
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="writer")
+
+    @timed("reader")
+    def read(self, keys: list[str]) -> list[tuple[str, Any]]:
+        # the busy time of the readers, bench splits the read in its ratio
+        return self.get(keys)
+
+    def submit(self, keys: list[str]) -> list[asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        # a context copy per chunk, so the latency spans of the request follow
+        return [
+            loop.run_in_executor(
+                self.reader,
+                copy_context().run,
+                self.read,
+                keys[i : i + self.chunk_size],
+            )
+            for i in range(0, len(keys), self.chunk_size)
+        ]
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        results = await asyncio.gather(*self.submit(keys))
+        return [item for result in results for item in result]
+
+    async def mget_stream(
+        self, keys: list[str]
+    ) -> AsyncIterator[tuple[list[tuple[str, Any]], list[str]]]:
+        chunks = self.submit(keys)
+        starts = {chunk: i * self.chunk_size for i, chunk in enumerate(chunks)}
+        pending = set(chunks)
+        # in the order the readers finish them
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for chunk in done:
+                hits = chunk.result()
+                found = set(k for k, _ in hits)
+                start = starts[chunk]
+                misses = [
+                    k for k in keys[start : start + self.chunk_size] if k not in found
+                ]
+                yield hits, misses
+
+    async def run_write(self, fn, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.writer, copy_context().run, fn, *args)
+
+    def close(self) -> None:
+        # let queued writes finish before the store closes
+        self.reader.shutdown()
+        self.writer.shutdown()
+        super().close()
+
+
+class ThreadedLMDBMsgpackCache(ThreadedCache, LMDBMsgpackCache):
+    # pickle and snappy hold the GIL, with them the reader threads only
+    # queued behind each other and lmdb-threaded was slower than lmdb
+    pass
+
+
+class ThreadedBoltDBCache(ThreadedCache, BoltDBCache):
+    # pure python, the threads only keep the loop free, chunks don't overlap
+    readers = 1
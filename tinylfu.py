@@ -0,0 +1,194 @@
+from collections import Counter, OrderedDict
+from typing import Any
+
+import numpy as np
+
+from backends import (
+    CacheBackend,
+    TimedPickleSerializer,
+    expired,
+    expires_at,
+    now_ms,
+)
+
+# odd 64 bit multipliers, one per sketch row
+SEEDS = (
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0x27D4EB2F165667C5,
+)
+MASK64 = (1 << 64) - 1
+SEED_COLUMN = np.array(SEEDS, dtype=np.uint64)[:, None]
+ROWS = np.arange(len(SEEDS))[:, None]
+
+# counters saturate like 4 bit ones
+MAX_COUNT = 15
+
+
+class FrequencySketch:
+    # count-min sketch of recent access counts. every counter is halved after
+    # `sample` increments, so keys that used to be popular fade out. single
+    # keys are read through the bytearray, whole batches through a NumPy view
+    # of the same memory
+    def __init__(self, capacity: int) -> None:
+        self.width = 1 << max(4, (capacity - 1).bit_length())
+        self.rows = [(row * self.width, seed) for row, seed in enumerate(SEEDS)]
+        self.table = bytearray(self.width * len(SEEDS))
+        self.counts = np.frombuffer(self.table, dtype=np.uint8).reshape(
+            len(SEEDS), self.width
+        )
+        self.sample = 10 * capacity
+        self.additions = 0
+
+    def indexes(self, key: str) -> list[int]:
+        h = hash(key) & MASK64
+        mask = self.width - 1
+        return [
+            offset + ((h * seed & MASK64) >> 32 & mask) for offset, seed in self.rows
+        ]
+
+    def frequency(self, key: str) -> int:
+        return min(self.table[i] for i in self.indexes(key))
+
+    def increment(self, keys: list[str]) -> None:
+        # same indexes as indexes(), for the whole batch at once
+        h = np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys))
+        columns = SEED_COLUMN * h.view(np.uint64) >> np.uint64(32)
+        columns &= np.uint64(self.width - 1)
+        np.add.at(self.counts, (ROWS, columns), 1)
+        np.minimum(self.counts, MAX_COUNT, out=self.counts)
+
+        self.additions += len(keys)
+        if self.additions >= self.sample:
+            self.counts >>= 1
+            self.additions //= 2
+
+
+class TinyLFUCache(CacheBackend):
+    # W-TinyLFU: new entries land in a small LRU window. the window's victim
+    # only enters the main segmented LRU when the sketch says it is used more
+    # often than the main victim it would replace, so one-off keys can't flush
+    # the popular ones. entries that are hit again in probation move to the
+    # protected segment
+    process_local = True
+
+    def __init__(
+        self,
+        read_only=False,
+        max_entries=100000,
+        max_bytes: int | None = None,
+        window=0.01,
+        protected=0.8,
+    ) -> None:
+        # with a byte budget values are kept pickled and weigh their length
+        self.by_bytes = max_bytes is not None
+        self.serializer = TimedPickleSerializer()
+        self.budget = max_bytes if self.by_bytes else max_entries
+        self.window_max = max(1, int(self.budget * window))
+        self.main_max = self.budget - self.window_max
+        self.protected_max = int(self.main_max * protected)
+
+        self.sketch = FrequencySketch(max_entries)
+        # key -> (expires, value, weight), least recently used first
+        self.window: OrderedDict[str, tuple[int, Any, int]] = OrderedDict()
+        self.probation: OrderedDict[str, tuple[int, Any, int]] = OrderedDict()
+        self.protected: OrderedDict[str, tuple[int, Any, int]] = OrderedDict()
+        self.used = Counter()
+        self.counters = Counter()
+
+    def segment(self, key: str) -> OrderedDict | None:
+        for segment in (self.window, self.probation, self.protected):
+            if key in segment:
+                return segment
+        return None
+
+    def used_by(self, segment: OrderedDict) -> int:
+        return self.used[id(segment)]
+
+    def add(self, segment: OrderedDict, key: str, entry: tuple[int, Any, int]) -> None:
+        segment[key] = entry
+        self.used[id(segment)] += entry[2]
+
+    def remove(self, segment: OrderedDict, key: str) -> tuple[int, Any, int]:
+        entry = segment.pop(key)
+        self.used[id(segment)] -= entry[2]
+        return entry
+
+    def main_used(self) -> int:
+        return self.used_by(self.probation) + self.used_by(self.protected)
+
+    def victim(self) -> tuple[OrderedDict, str] | None:
+        for segment in (self.probation, self.protected):
+            if segment:
+                return segment, next(iter(segment))
+        return None
+
+    def promote(self, key: str) -> None:
+        self.add(self.protected, key, self.remove(self.probation, key))
+        # protected overflows back into probation, not out of the cache
+        while self.used_by(self.protected) > self.protected_max:
+            demoted = next(iter(self.protected))
+            self.add(self.probation, demoted, self.remove(self.protected, demoted))
+
+    def admit(self, key: str, entry: tuple[int, Any, int]) -> None:
+        candidate = self.sketch.frequency(key)
+        while self.main_used() + entry[2] > self.main_max:
+            victim = self.victim()
+            if victim is None or candidate <= self.sketch.frequency(victim[1]):
+                self.counters["rejected"] += 1
+                return
+            self.remove(*victim)
+            self.counters["evicted"] += 1
+        self.add(self.probation, key, entry)
+        self.counters["admitted"] += 1
+
+    def evict_window(self) -> None:
+        while self.used_by(self.window) > self.window_max:
+            key = next(iter(self.window))
+            self.admit(key, self.remove(self.window, key))
+
+    async def mget(self, keys: list[str]) -> list[tuple[str, Any]]:
+        ret = []
+        now = now_ms()
+        self.sketch.increment(keys)
+        for key in keys:
+            segment = self.segment(key)
+            if segment is None:
+                continue
+            expires, value, _ = segment[key]
+            if expired(expires, now):
+                self.remove(segment, key)
+                continue
+
+            if segment is self.probation:
+                self.promote(key)
+            else:
+                segment.move_to_end(key)
+            ret.append((key, self.serializer.loads(value) if self.by_bytes else value))
+        return ret
+
+    async def mset(self, pairs: list[tuple[str, Any]], ttl: int | None = None) -> None:
+        expires = expires_at(ttl)
+        for key, value in pairs:
+            if self.by_bytes:
+                value = self.serializer.dumps(value)
+            entry = (expires, value, len(value) if self.by_bytes else 1)
+            if entry[2] > self.window_max:
+                continue
+
+            segment = self.segment(key)
+            if segment is not None:
+                self.remove(segment, key)
+                self.add(segment, key, entry)
+            else:
+                self.add(self.window, key, entry)
+            self.evict_window()
+
+        # a rewrite in main may have grown past the budget
+        while self.main_used() > self.main_max:
+            self.remove(*self.victim())
+            self.counters["evicted"] += 1
+
+    def stats(self) -> dict[str, float]:
+        return dict(self.counters)
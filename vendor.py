@@ -0,0 +1,99 @@
+import msgspec
+
+
+# the vendor document returned by origin.fetch
+class Vendor(msgspec.Struct):
+    id: str = msgspec.field(name="_id")
+    vendor_id: str = ""
+    day: str = ""
+    vendor_nm: str = ""
+    logo_exist_yn: bool = False
+    thumbnail_exist_yn: bool = False
+    new_tag_mark_start_date: str | None = None
+    vendor_new_for_uprank_yn: bool = False
+    vendor_new_yn: bool = False
+    franchise_id: int | None = None
+    vendor_type_cd: str = ""
+    yostore_target_yn: bool = False
+    review_cnt: int = 0
+    review_avg_cnt: float = 0.0
+    vendor_contract_yn: bool = False
+    current_extra_discount_yn: bool = False
+    extra_discount_amt: int = 0
+    discount_rate: float = 0.0
+    payment_method_code_list: list[str] = []
+    vendor_open_yn: bool = False
+    vendor_oe_yn: bool = False
+    vendor_online_yn: bool = False
+    pickup_available_time: int = 0
+    test_vendor_yn: bool = False
+    category_list: list[str] = []
+    one_dish_threshold: int = 0
+    display_enable_yn: bool = False
+    delivery_discount_yn: bool = False
+    pickup_discount_yn: bool = False
+    preorder_discount_yn: bool = False
+    vendor_open_for_swimlane_yn: bool = False
+    hygienic_yn: bool = False
+    company_no: str | None = None
+    partner_tenant_cd_list: list[str] = []
+    hygiene_grade_cd: str | None = None
+    rank_keyword: str | None = None
+    delivery_order_cnt: int = 0
+    takeout_order_cnt: int = 0
+    delivery_coupon_yn: bool = False
+    pickup_coupon_yn: bool = False
+    delivery_max_coupon_price: int = 0
+    pickup_max_coupon_price: int = 0
+    created_at: str | None = None
+    modified_at: str | None = None
+    vd_recent_eta: int = -1
+    vd_recent_eta_expires_at: str | None = None
+
+
+# what ranking reads: ids, scores and flags. the detail page needs all fields
+HOT_FIELDS = frozenset(
+    {
+        "_id",
+        "vendor_id",
+        "franchise_id",
+        "review_cnt",
+        "review_avg_cnt",
+        "delivery_order_cnt",
+        "takeout_order_cnt",
+        "discount_rate",
+        "extra_discount_amt",
+        "current_extra_discount_yn",
+        "delivery_discount_yn",
+        "pickup_discount_yn",
+        "delivery_coupon_yn",
+        "pickup_coupon_yn",
+        "delivery_max_coupon_price",
+        "one_dish_threshold",
+        "vendor_open_yn",
+        "vendor_online_yn",
+        "display_enable_yn",
+        "test_vendor_yn",
+        "vendor_new_yn",
+        "vendor_new_for_uprank_yn",
+        "hygienic_yn",
+        "vd_recent_eta",
+    }
+)
+
+# change every few minutes, patched into the cache instead of rewriting vendors
+FAST_FIELDS = frozenset(
+    {
+        "vendor_open_yn",
+        "vendor_online_yn",
+        "vendor_oe_yn",
+        "current_extra_discount_yn",
+        "extra_discount_amt",
+        "delivery_coupon_yn",
+        "pickup_coupon_yn",
+        "delivery_max_coupon_price",
+        "pickup_max_coupon_price",
+        "vd_recent_eta",
+        "vd_recent_eta_expires_at",
+    }
+)
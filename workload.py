@@ -0,0 +1,214 @@
+import argparse
+import math
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+import numpy as np
+
+# file header: magic, format version
+HEADER = struct.Struct("<4sH")
+MAGIC = b"VTRC"
+FORMAT = 1
+
+# record header: timestamp, lat, lng, key count, compressed key bytes
+RECORD = struct.Struct("<dddII")
+
+DAY = 24 * 60 * 60
+
+# around kangnam station, like h3-based Testdata
+KANGNAM = (37.4855495, 127.013712)
+# degrees per km there
+KM_LAT = 0.008998
+KM_LNG = 0.0113428
+
+
+def smallest(values: np.ndarray, size: int) -> np.ndarray:
+    # indices of the `size` smallest values, all of them if there are fewer
+    if size >= len(values):
+        return np.arange(len(values))
+    return np.argpartition(values, size)[:size]
+
+
+@dataclass
+class Request:
+    timestamp: float
+    lat: float
+    lng: float
+    keys: list[str]
+
+
+class Zipf:
+    # popularity rank by key, rank r is drawn with weight 1 / r**s. ranks are
+    # shuffled once, so the hot keys are spread over the key space
+    def __init__(self, keys: list[str], s=1.0, seed: int | None = None) -> None:
+        self.keys = np.array(keys)
+        self.rng = np.random.default_rng(seed)
+        ranks = self.rng.permutation(len(keys)) + 1
+        self.log_weights = -s * np.log(ranks)
+
+    def sample(self, size: int) -> list[str]:
+        # distinct keys by weight without replacement (Efraimidis-Spirakis),
+        # the `size` smallest exponential clocks scaled by the weights
+        clocks = np.log(self.rng.exponential(size=len(self.keys))) - self.log_weights
+        return self.keys[smallest(clocks, size)].tolist()
+
+
+class Hotspots:
+    # a share of the requests comes from around a few hot neighbourhoods, the
+    # hottest first by zipf, the rest is uniform over the whole box
+    def __init__(
+        self,
+        center=KANGNAM,
+        box_km=10.0,
+        count=8,
+        spread_km=0.5,
+        share=0.8,
+        seed: int | None = None,
+    ) -> None:
+        self.center = center
+        self.box_km = box_km
+        self.spread_km = spread_km
+        self.share = share
+        self.rng = np.random.default_rng(seed)
+        self.spots = self.uniform(count)
+        weights = 1 / np.arange(1, count + 1)
+        self.weights = weights / weights.sum()
+
+    def uniform(self, size: int) -> np.ndarray:
+        offsets = self.rng.uniform(-self.box_km, self.box_km, size=(size, 2))
+        return np.array(self.center) + offsets * (KM_LAT, KM_LNG)
+
+    def sample(self, size: int) -> list[tuple[float, float]]:
+        spots = self.spots[self.rng.choice(len(self.spots), size, p=self.weights)]
+        offsets = self.rng.normal(0, self.spread_km, size=(size, 2))
+        near = spots + offsets * (KM_LAT, KM_LNG)
+        hot = self.rng.random(size) < self.share
+        locations = np.where(hot[:, None], near, self.uniform(size))
+        return [(round(lat, 6), round(lng, 6)) for lat, lng in locations.tolist()]
+
+
+class Diurnal:
+    # arrival times of a poisson process whose rate follows the day, lowest
+    # at night and highest at lunch and dinner
+    def __init__(
+        self,
+        rate=1.0,
+        peaks=(12.0, 18.5),
+        width=1.5,
+        night=0.1,
+        seed: int | None = None,
+    ) -> None:
+        self.rate = rate
+        self.peaks = peaks
+        self.width = width
+        self.night = night
+        self.rng = np.random.default_rng(seed)
+
+    def intensity(self, t: float) -> float:
+        hour = t % DAY / 3600
+        peak = sum(
+            math.exp(-(((hour - p + 12) % 24 - 12) ** 2) / (2 * self.width**2))
+            for p in self.peaks
+        )
+        return self.rate * (self.night + (1 - self.night) * min(peak, 1.0))
+
+    def sample(self, size: int, start=0.0) -> list[float]:
+        # thinning: candidates at the peak rate, kept by the rate of their time
+        times, t = [], start
+        while len(times) < size:
+            t += self.rng.exponential(1 / self.rate)
+            if self.rng.random() * self.rate < self.intensity(t):
+                times.append(t)
+        return times
+
+
+def generate(
+    kind: str,
+    keys: list[str],
+    requests: int,
+    size: int,
+    s=1.0,
+    seed: int | None = None,
+) -> list[Request]:
+    # uniform, zipf, hotspot (the vendors nearest to requests from hot
+    # neighbourhoods) or diurnal (zipf keys at daily arrival times from hot
+    # neighbourhoods). h3-based picks the keys around the location itself
+    rng = np.random.default_rng(seed)
+    if kind == "uniform":
+        return [
+            Request(float(i), *KANGNAM, rng.choice(keys, size, replace=False).tolist())
+            for i in range(requests)
+        ]
+
+    if kind == "hotspot":
+        # every key is a vendor somewhere in the box, a request lists the ones
+        # nearest to it, so the keys around the hot spots are read the most
+        spots = Hotspots(seed=seed)
+        vendors = spots.uniform(len(keys)) / (KM_LAT, KM_LNG)
+        names = np.array(keys)
+
+        def nearest(lat: float, lng: float) -> list[str]:
+            distances = ((vendors - (lat / KM_LAT, lng / KM_LNG)) ** 2).sum(axis=1)
+            return names[smallest(distances, size)].tolist()
+
+        return [
+            Request(float(i), lat, lng, nearest(lat, lng))
+            for i, (lat, lng) in enumerate(spots.sample(requests))
+        ]
+
+    zipf = Zipf(keys, s=s, seed=seed)
+    if kind == "zipf":
+        return [Request(float(i), *KANGNAM, zipf.sample(size)) for i in range(requests)]
+
+    assert kind == "diurnal", f"unknown workload {kind}"
+    # about a third of the peak rate on average, so the trace spans a day
+    times = Diurnal(rate=3 * requests / DAY, seed=seed).sample(requests)
+    locations = Hotspots(seed=seed).sample(requests)
+    return [
+        Request(t, lat, lng, zipf.sample(size))
+        for t, (lat, lng) in zip(times, locations)
+    ]
+
+
+def record(path: str, requests: Iterable[Request]) -> None:
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT))
+        for r in requests:
+            data = zlib.compress("\n".join(r.keys).encode())
+            f.write(RECORD.pack(r.timestamp, r.lat, r.lng, len(r.keys), len(data)))
+            f.write(data)
+
+
+def replay(path: str) -> Iterator[Request]:
+    with open(path, "rb") as f:
+        magic, version = HEADER.unpack(f.read(HEADER.size))
+        assert magic == MAGIC and version == FORMAT, f"{path} is not a trace"
+        while header := f.read(RECORD.size):
+            timestamp, lat, lng, count, length = RECORD.unpack(header)
+            keys = zlib.decompress(f.read(length)).decode().split("\n") if count else []
+            yield Request(timestamp, lat, lng, keys)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument(
+        "--kind", choices=["uniform", "zipf", "hotspot", "diurnal"], default="zipf"
+    )
+    parser.add_argument("--keys", type=int, default=900000)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--size", type=int, default=8000)
+    parser.add_argument("--s", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    keys = [str(i) for i in range(args.keys)]
+    requests = generate(
+        args.kind, keys, args.requests, args.size, s=args.s, seed=args.seed
+    )
+    record(args.path, requests)
+    print(
+        f"{len(requests)} requests, {len(set(k for r in requests for k in r.keys))} keys"
+    )
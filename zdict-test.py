@@ -0,0 +1,59 @@
+import asyncio
+import pickle
+import zlib
+from time import perf_counter
+
+import snappy
+
+from backends import MsgpackSerializer
+from origin import fetch
+from zdict import ZDictCodec, train
+
+
+def measure(name, dumps, loads, values) -> None:
+    start_time = perf_counter()
+    encoded = [dumps(v) for v in values]
+    encode_time = perf_counter() - start_time
+
+    start_time = perf_counter()
+    decoded = [loads(e) for e in encoded]
+    decode_time = perf_counter() - start_time
+    assert decoded == values
+
+    size = sum(len(e) for e in encoded) / len(encoded)
+    print(
+        f"{name:<16s}: {size:>7.1f} bytes/entry, encode: {encode_time / len(values) * 1e6:.2f}us, decode: {decode_time / len(values) * 1e6:.2f}us"
+    )
+
+
+if __name__ == "__main__":
+    # trained on other vendors than the ones measured
+    samples = [pickle.dumps(v) for _, v in asyncio.run(fetch(map(str, range(1000))))]
+    values = [v for _, v in asyncio.run(fetch(map(str, range(100000, 110000))))]
+
+    codec = ZDictCodec()
+    codec.publish(train(samples))
+    print(f"dictionary: {len(codec.dictionaries[codec.version])} bytes")
+
+    msgpack = MsgpackSerializer(schema=dict, compress_min_size=0)
+
+    measure("pickle", pickle.dumps, pickle.loads, values)
+    measure(
+        "pickle+snappy",
+        lambda v: snappy.compress(pickle.dumps(v)),
+        lambda e: pickle.loads(snappy.uncompress(e)),
+        values,
+    )
+    measure(
+        "pickle+zlib",
+        lambda v: zlib.compress(pickle.dumps(v)),
+        lambda e: pickle.loads(zlib.decompress(e)),
+        values,
+    )
+    measure("msgpack+snappy", msgpack.dumps, msgpack.loads, values)
+    measure(
+        "pickle+zdict",
+        lambda v: codec.compress(pickle.dumps(v)),
+        lambda e: pickle.loads(codec.decompress(e)),
+        values,
+    )
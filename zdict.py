@@ -0,0 +1,77 @@
+import struct
+import zlib
+from typing import Any
+
+import redis
+
+# dictionary version in front of every value, 0 is plain zlib
+VERSION = struct.Struct(">H")
+
+# zlib only looks 32KB back, anything before that is never referenced
+MAX_SIZE = 32 * 1024
+
+
+def train(samples: list[bytes], size=MAX_SIZE, novelty=0.2) -> bytes:
+    # zlib has no trainer. vendor records share their field names and most
+    # values, so the dictionary is made of whole records, skipping those that
+    # already compress below `novelty` of their size against it
+    dictionary = b""
+    for sample in samples:
+        if len(dictionary) + len(sample) > size:
+            continue
+        if dictionary:
+            c = zlib.compressobj(9, zdict=dictionary)
+            if len(c.compress(sample) + c.flush()) < len(sample) * novelty:
+                continue
+        dictionary += sample
+    return dictionary
+
+
+class ZDictCodec:
+    # zlib with a preset dictionary. values keep the version they were
+    # compressed with, so they stay readable after a retrain. with a redis
+    # client the dictionaries are shared by every process through one hash
+    key = "zdict"
+
+    def __init__(self, db: redis.Redis | None = None, level=6) -> None:
+        self.db = db
+        self.level = level
+        self.dictionaries = {0: b""}
+        self.refresh()
+
+    @property
+    def version(self) -> int:
+        return max(self.dictionaries)
+
+    def refresh(self) -> None:
+        if self.db is not None:
+            self.update(self.db.hgetall(self.key))
+
+    def update(self, stored: dict[bytes, bytes]) -> None:
+        # the hash as HGETALL returns it, for callers reading it themselves
+        self.dictionaries.update({int(k): v for k, v in stored.items()})
+
+    def known(self, data: Any) -> bool:
+        return VERSION.unpack_from(data)[0] in self.dictionaries
+
+    def publish(self, dictionary: bytes) -> int:
+        # HSETNX, so a process training at the same time gets the next version
+        while True:
+            version = self.version + 1
+            if self.db is None or self.db.hsetnx(self.key, version, dictionary):
+                self.dictionaries[version] = dictionary
+                return version
+            self.refresh()
+
+    def compress(self, data: bytes) -> bytes:
+        version = self.version
+        c = zlib.compressobj(self.level, zdict=self.dictionaries[version])
+        return VERSION.pack(version) + c.compress(data) + c.flush()
+
+    def decompress(self, data: Any) -> bytes:
+        (version,) = VERSION.unpack_from(data)
+        if version not in self.dictionaries:
+            # trained by another process
+            self.refresh()
+        d = zlib.decompressobj(zdict=self.dictionaries[version])
+        return d.decompress(memoryview(data)[VERSION.size :]) + d.flush()